@@ -0,0 +1,729 @@
+'''
+benchmark
+===
+    可复现的训练与推断性能基准
+Provides
+--------
+- 按学生数据集与葡萄酒数据集的格式生成指定规模的合成数据，分别计时
+  `loadData`（拟合预处理流水线，及命中缓存时）、`KNN.predict`、KNN 的 IVF/LSH 近似检索（同时记录召回率，LSH 另在 16 维正态分布数据上与精确检索比较）、内存映射训练数据上的 KNN 与 k-means、LR 训练、增量训练与预测、SVM 核函数表/训练/多分类训练/近似训练/分类、`PCA`、`KMeans` 与轮廓系数，
+  记录耗时、峰值内存与吞吐量到 JSON 文件::
+
+    > python benchmark.py --sizes 1000 10000 --output result.json
+
+- 与保存的基线结果比较，任一项耗时超过基线的 `1 + tolerance` 倍时以非零状态退出::
+
+    > python benchmark.py --sizes 1000 10000 --baseline baseline.json --tolerance 0.2
+
+- 以 float32 运行全部项目（结果按浮点类型分别与基线比较）::
+
+    > python benchmark.py --sizes 1000 10000 --dtype float32
+
+- 精度检查：同一份合成数据上分别以 float64 与 float32 训练与推断，比较决策函数值的最大偏差、
+  预测标签的一致率与 F1 值，任一项一致率低于 `--min-agreement` 时以非零状态退出::
+
+    > python benchmark.py --sizes 1000 --precision
+
+Notes
+-----
+- 每一项在独立的子进程中运行，峰值内存为子进程的峰值常驻内存(max RSS)，包含输入数据
+- 时间复杂度为 O(n^2) 的项目（SVM、轮廓系数等）默认只运行到 `LIMITS` 中的规模，可用 `--no-limits` 取消
+'''
+
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUPERVISE = os.path.join(ROOT, 'supervise', 'src')
+UNSUPERVISE = os.path.join(ROOT, 'unsupervise', 'src')
+sys.path.append(os.path.join(ROOT, 'common'))
+import instrument  # 分阶段计时与计数
+import store  # 内存映射的数据矩阵
+
+TEST_ROWS = 1000  # KNN 的查询数目
+BLOCK_ROWS = 4096  # 分块推断的块大小
+
+# 学生数据集各属性的取值：类别属性为按字典序排列的取值（与标签编码一致），数值属性为取值范围
+STUDENT_SCHEMA = [
+    ('school', ['GP', 'MS']), ('sex', ['F', 'M']), ('age', (15, 22)),
+    ('address', ['R', 'U']), ('famsize', ['GT3', 'LE3']), ('Pstatus', ['A', 'T']),
+    ('Medu', (0, 4)), ('Fedu', (0, 4)),
+    ('Mjob', ['at_home', 'health', 'other', 'services', 'teacher']),
+    ('Fjob', ['at_home', 'health', 'other', 'services', 'teacher']),
+    ('reason', ['course', 'home', 'other', 'reputation']),
+    ('guardian', ['father', 'mother', 'other']),
+    ('traveltime', (1, 4)), ('studytime', (1, 4)), ('failures', (0, 3)),
+    ('schoolsup', ['no', 'yes']), ('famsup', ['no', 'yes']), ('paid', ['no', 'yes']),
+    ('activities', ['no', 'yes']), ('nursery', ['no', 'yes']), ('higher', ['no', 'yes']),
+    ('internet', ['no', 'yes']), ('romantic', ['no', 'yes']),
+    ('famrel', (1, 5)), ('freetime', (1, 5)), ('goout', (1, 5)),
+    ('Dalc', (1, 5)), ('Walc', (1, 5)), ('health', (1, 5)), ('absences', (0, 93)),
+]
+
+# 葡萄酒数据集 13 个属性的均值与标准差
+WINE_MEAN = np.array([13.0, 2.34, 2.37, 19.5, 99.7, 2.29, 2.03,
+                      0.36, 1.59, 5.06, 0.96, 2.61, 747.0])
+WINE_STD = np.array([0.81, 1.12, 0.27, 3.34, 14.3, 0.63, 1.0,
+                     0.12, 0.57, 2.32, 0.23, 0.71, 315.0])
+
+LIMITS = {  # 各项目默认运行的最大规模
+    'KNN.predict': 100000,
+    'KNN.ivf': 100000,
+    'KNN.lsh': 100000,
+    'KNN.gaussian': 200000,
+    'KNN.lsh.gaussian': 200000,
+    'KNN.mmap': 100000,
+    'LR.train': 100000,
+    'LR.partialFit': 100000,
+    'SVM.gram': 5000,
+    'SVM.train': 2000,
+    'SVM.ovo': 2000,
+    'silhouette': 2000,
+}
+
+CASES = []  # (名称, 数据集, 准备函数)
+
+
+def importFrom(directory, module, alias):
+    '''
+    从源码目录导入模块
+    ===============
+    Arguments
+    ---------
+    - `directory` 源码目录，同时加入 `sys.path` 以便模块导入同目录的其他模块
+    - `module` 模块文件名（不含 `.py`）
+    - `alias` 导入后的模块名，用于区分两个目录下同名的 `main`
+
+    Returns
+    -------
+    - 模块
+    '''
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    if alias in sys.modules:
+        return sys.modules[alias]
+    spec = importlib.util.spec_from_file_location(
+        alias, os.path.join(directory, module + '.py'))
+    loaded = importlib.util.module_from_spec(spec)
+    sys.modules[alias] = loaded
+    spec.loader.exec_module(loaded)
+    return loaded
+
+
+def syntheticStudent(rows, seed):
+    '''
+    生成学生数据集格式的合成数据
+    ========================
+    Arguments
+    ---------
+    - `rows` 观测数
+    - `seed` 随机数种子
+
+    Returns
+    -------
+    - `attributes` 编码后的 30 个属性，与 `loadData` 的编码一致
+    - `grades` 成绩 G1 G2 G3
+    '''
+    rng = np.random.default_rng(seed)
+    attributes = np.empty([rows, len(STUDENT_SCHEMA)], dtype=np.int64)
+    for i, (_, values) in enumerate(STUDENT_SCHEMA):
+        if isinstance(values, list):
+            attributes[:, i] = rng.integers(0, len(values), rows)
+        else:
+            attributes[:, i] = rng.integers(values[0], values[1] + 1, rows)
+    G1 = np.clip(np.rint(rng.normal(11, 3, rows)), 0, 20)
+    G2 = np.clip(np.rint(G1 + rng.normal(0, 1.5, rows)), 0, 20)
+    G3 = np.clip(np.rint(G2 + rng.normal(0, 1.5, rows)), 0, 20)
+    return attributes, np.stack([G1, G2, G3], axis=1).astype(np.int64)
+
+
+def writeStudent(file, attributes, grades):
+    '''
+    按学生数据集的 CSV 格式写入合成数据
+    ==============================
+    '''
+    with open(file, 'w', newline='') as fileStream:
+        csvWriter = csv.writer(fileStream, delimiter=';',
+                               quoting=csv.QUOTE_NONNUMERIC)
+        csvWriter.writerow([name for name, _ in STUDENT_SCHEMA] +
+                           ['G1', 'G2', 'G3'])
+        for datum, grade in zip(attributes.tolist(), grades.tolist()):
+            line = [values[x] if isinstance(values, list) else x
+                    for (_, values), x in zip(STUDENT_SCHEMA, datum)]
+            csvWriter.writerow(line + [str(grade[0]), str(grade[1]), grade[2]])
+
+
+def studentFeatures(attributes, grades, normalize=False):
+    '''
+    与 `loadData` 相同的特征矩阵与及格标签
+    ================================
+    缩放时以各属性的取值范围近似在训练数据上拟合的最小值与最大值
+    '''
+    data = attributes.astype(float)
+    grade = grades[:, :2].astype(float)
+    if normalize:
+        lower = np.array([0 if isinstance(values, list) else values[0]
+                          for _, values in STUDENT_SCHEMA], dtype=float)
+        upper = np.array([len(values) - 1 if isinstance(values, list) else values[1]
+                          for _, values in STUDENT_SCHEMA], dtype=float)
+        data = (data - lower) / (upper - lower)
+        grade = grade / 20
+    return np.hstack((data, grade)), (grades[:, 2] >= 10).astype(int)
+
+
+def syntheticWine(rows, seed):
+    '''
+    生成葡萄酒数据集格式的合成数据
+    ==========================
+    Arguments
+    ---------
+    - `rows` 观测数
+    - `seed` 随机数种子
+
+    Returns
+    -------
+    - `identifiers` 类别 1, 2, 3
+    - `data` 13 个属性
+    '''
+    rng = np.random.default_rng(seed)
+    offsets = rng.normal(0, 1, [3, WINE_MEAN.size]) * WINE_STD
+    identifiers = rng.integers(0, 3, rows)
+    data = WINE_MEAN + offsets[identifiers] + \
+        rng.normal(0, 0.6, [rows, WINE_MEAN.size]) * WINE_STD
+    return identifiers + 1, np.abs(data)
+
+
+def writeWine(file, identifiers, data):
+    '''
+    按葡萄酒数据集的格式写入合成数据
+    ===========================
+    '''
+    with open(file, 'w') as fileStream:
+        for identifier, datum in zip(identifiers.tolist(), data.tolist()):
+            fileStream.write(str(identifier) + ',' +
+                             ','.join('{:.4g}'.format(x) for x in datum) + '\n')
+
+
+def case(name, dataset):
+    '''
+    注册基准项目的装饰器，被装饰的函数完成（不计时的）准备工作并返回待计时的无参函数，
+    或 `(无参函数, 处理的观测数)`，观测数缺省为数据规模；
+    `workspace['stats']` 为本项目的统计对象，其中的分阶段耗时会写入结果的 `stages`，序列值的最后一个会写入 `series`
+    '''
+    def decorator(prepare):
+        CASES.append((name, dataset, prepare))
+        return prepare
+    return decorator
+
+
+@case('loadData.student', 'student')
+def _(workspace, rows, seed):
+    main = importFrom(SUPERVISE, 'main', 'supervise_main')
+    preprocess = importFrom(SUPERVISE, 'preprocess', 'preprocess')
+    return lambda: main.loadData(workspace['student'], preprocess.Pipeline(
+        scaling='minmax', dtype=workspace['dtype']), fit=True)
+
+
+@case('loadData.cached', 'student')
+def _(workspace, rows, seed):
+    main = importFrom(SUPERVISE, 'main', 'supervise_main')
+    preprocess = importFrom(SUPERVISE, 'preprocess', 'preprocess')
+    cache = os.path.join(workspace['directory'], 'cache')
+    pipeline = preprocess.Pipeline(scaling='minmax', dtype=workspace['dtype'])
+    main.loadData(workspace['student'], pipeline, fit=True, cache=cache)  # 写入缓存
+    return lambda: main.loadData(workspace['student'], pipeline, fit=True, cache=cache)
+
+
+@case('KNN.predict', 'student')
+def _(workspace, rows, seed):
+    KNN = importFrom(SUPERVISE, 'KNN', 'KNN')
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    testData, _ = studentFeatures(*syntheticStudent(TEST_ROWS, seed + 1))
+    model = KNN.NearestNeighborsClassifier(
+        K=27, dtype=workspace['dtype']).fit(trainData, trainLabel)
+    return (lambda: model.predict(testData)), TEST_ROWS  # 吞吐量按查询数计
+
+
+@case('KNN.mmap', 'student')
+def _(workspace, rows, seed):
+    KNN = importFrom(SUPERVISE, 'KNN', 'KNN')
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    testData, _ = studentFeatures(*syntheticStudent(TEST_ROWS, seed + 1))
+    file = os.path.join(workspace['directory'], 'knn-{}.npy'.format(rows))
+    store.write(file, [trainData], dtype=workspace['dtype'])
+    model = KNN.NearestNeighborsClassifier(
+        K=27, dtype=workspace['dtype']).fit(store.load(file), trainLabel)  # 按块读取训练数据
+    return (lambda: model.predict(testData)), TEST_ROWS
+
+
+def gaussianNeighbors(rows, seed):
+    '''
+    16 维标准正态分布的合成数据与随机标签，各向同性、近邻距离集中，是 LSH 较难处理的数据
+    '''
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((rows, 16)), rng.integers(0, 2, rows),
+            np.random.default_rng(seed + 1).standard_normal((TEST_ROWS, 16)))
+
+
+def approximateNeighbors(workspace, seed, trainData, trainLabel, testData, **params):
+    '''
+    建立近似检索的 KNN 模型，并记录相对精确检索的召回率
+    '''
+    KNN = importFrom(SUPERVISE, 'KNN', 'KNN')
+    model = KNN.NearestNeighborsClassifier(
+        K=27, dtype=workspace['dtype'], seed=seed, **params)
+    model.stats = workspace['stats']  # 记录建立索引的耗时
+    model.fit(trainData, trainLabel)
+    workspace['stats'].record('KNN.recall', KNN.recall(model, testData))
+    return (lambda: model.predict(testData)), TEST_ROWS
+
+
+@case('KNN.ivf', 'student')
+def _(workspace, rows, seed):
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    testData, _ = studentFeatures(*syntheticStudent(TEST_ROWS, seed + 1))
+    return approximateNeighbors(workspace, seed, trainData, trainLabel, testData, index='ivf', probes=8)
+
+
+@case('KNN.lsh', 'student')
+def _(workspace, rows, seed):
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    testData, _ = studentFeatures(*syntheticStudent(TEST_ROWS, seed + 1))
+    return approximateNeighbors(workspace, seed, trainData, trainLabel, testData, index='lsh', tables=16, hashes=4)
+
+
+@case('KNN.gaussian', 'gaussian')
+def _(workspace, rows, seed):
+    KNN = importFrom(SUPERVISE, 'KNN', 'KNN')
+    trainData, trainLabel, testData = gaussianNeighbors(rows, seed)
+    model = KNN.NearestNeighborsClassifier(
+        K=27, dtype=workspace['dtype']).fit(trainData, trainLabel)
+    return (lambda: model.predict(testData)), TEST_ROWS
+
+
+@case('KNN.lsh.gaussian', 'gaussian')
+def _(workspace, rows, seed):
+    return approximateNeighbors(workspace, seed, *gaussianNeighbors(rows, seed), index='lsh', tables=16, hashes=4)
+
+
+@case('LR.train', 'student')
+def _(workspace, rows, seed):
+    LR = importFrom(SUPERVISE, 'LR', 'LR')
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    model = LR.LogisticRegressionClassifier(
+        iteration=1, dtype=workspace['dtype'])
+    return lambda: model.fit(trainData, trainLabel)
+
+
+@case('LR.partialFit', 'student')
+def _(workspace, rows, seed):
+    LR = importFrom(SUPERVISE, 'LR', 'LR')
+    trainData, trainLabel = studentFeatures(*syntheticStudent(rows, seed))
+    model = LR.LogisticRegressionClassifier(
+        learning_rate=0.01, schedule='adam', dtype=workspace['dtype'])
+    return lambda: [model.partial_fit(trainData[start:start + BLOCK_ROWS], trainLabel[start:start + BLOCK_ROWS],
+                                      classes=[0, 1]) for start in range(0, rows, BLOCK_ROWS)]
+
+
+@case('LR.predict', 'student')
+def _(workspace, rows, seed):
+    LR = importFrom(SUPERVISE, 'LR', 'LR')
+    testData, testLabel = studentFeatures(*syntheticStudent(rows, seed))
+    model = LR.LogisticRegressionClassifier(iteration=1, dtype=workspace['dtype']).fit(
+        testData[:TEST_ROWS], testLabel[:TEST_ROWS])
+    return lambda: [model.predict(testData[start:start + BLOCK_ROWS])
+                    for start in range(0, rows, BLOCK_ROWS)]
+
+
+@case('SVM.gram', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    trainData, _ = studentFeatures(
+        *syntheticStudent(rows, seed), normalize=True)
+    machine = SVM.SupportVectorMachine(
+        kernel='Gaussian', sigma=10, dtype=workspace['dtype'])
+    trainData = trainData.astype(machine.dtype)
+    return lambda: machine.Kernel(trainData, trainData)
+
+
+@case('SVM.train', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    trainData, trainLabel = studentFeatures(
+        *syntheticStudent(rows, seed), normalize=True)
+    machine = SVM.SupportVectorMachine(
+        kernel='Gaussian', sigma=10, dtype=workspace['dtype'])
+    machine.stats = workspace['stats']  # 分别记录核函数表与 SMO 的耗时
+    return lambda: machine.fit(trainData, trainLabel)
+
+
+@case('SVM.ovo', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    attributes, grades = syntheticStudent(rows, seed)
+    trainData, _ = studentFeatures(attributes, grades, normalize=True)
+    band = np.searchsorted([10, 12, 14, 16], grades[:, 2], side='right')  # 成绩等级，同 `preprocess.GRADE_BANDS`
+    machine = SVM.SupportVectorMachine(
+        kernel='Gaussian', sigma=10, dtype=workspace['dtype'], strategy='ovo')
+    machine.stats = workspace['stats']
+    return lambda: machine.fit(trainData, band)
+
+
+@case('SVM.fourier', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    trainData, trainLabel = studentFeatures(
+        *syntheticStudent(rows, seed), normalize=True)
+    machine = SVM.SupportVectorMachine(kernel='Gaussian', sigma=10, dtype=workspace['dtype'],
+                                       approximation='fourier', components=500, seed=seed)
+    machine.stats = workspace['stats']  # 分别记录特征映射与牛顿法的耗时
+    return lambda: machine.fit(trainData, trainLabel)
+
+
+@case('SVM.nystroem', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    trainData, trainLabel = studentFeatures(
+        *syntheticStudent(rows, seed), normalize=True)
+    machine = SVM.SupportVectorMachine(kernel='Gaussian', sigma=10, dtype=workspace['dtype'],
+                                       approximation='nystroem', components=500, seed=seed)
+    machine.stats = workspace['stats']
+    return lambda: machine.fit(trainData, trainLabel)
+
+
+@case('SVM.classify', 'student')
+def _(workspace, rows, seed):
+    SVM = importFrom(SUPERVISE, 'SVM', 'SVM')
+    testData, testLabel = studentFeatures(
+        *syntheticStudent(rows, seed), normalize=True)
+    machine = SVM.SupportVectorMachine(kernel='Gaussian', sigma=10, dtype=workspace['dtype']).fit(
+        testData[:TEST_ROWS], testLabel[:TEST_ROWS])
+    return lambda: [machine.predict(testData[start:start + BLOCK_ROWS])
+                    for start in range(0, rows, BLOCK_ROWS)]
+
+
+@case('loadData.wine', 'wine')
+def _(workspace, rows, seed):
+    main = importFrom(UNSUPERVISE, 'main', 'unsupervise_main')
+    return lambda: main.loadData(workspace['wine'], workspace['dtype'])
+
+
+def standardizedWine(rows, seed, dtype='float64'):
+    _, data = syntheticWine(rows, seed)
+    return ((data - np.mean(data, axis=0)) / np.std(data, axis=0)).astype(dtype)
+
+
+@case('PCA', 'wine')
+def _(workspace, rows, seed):
+    PCA = importFrom(UNSUPERVISE, 'PCA', 'PCA')
+    data = standardizedWine(rows, seed, workspace['dtype'])
+    return lambda: PCA.PrincipalComponentAnalysis(0.99, dtype=workspace['dtype']).fit_transform(data)
+
+
+@case('KMeans', 'wine')
+def _(workspace, rows, seed):
+    main = importFrom(UNSUPERVISE, 'main', 'unsupervise_main')
+    PCA = importFrom(UNSUPERVISE, 'PCA', 'PCA')
+    data = PCA.PrincipalComponentAnalysis(0.99, dtype=workspace['dtype']).fit_transform(
+        standardizedWine(rows, seed, workspace['dtype']))
+    np.random.seed(seed)  # Forgy 初始化使用全局随机数
+    return lambda: main.clusterKMeans(3, data)
+
+
+@case('KMeans.mmap', 'wine')
+def _(workspace, rows, seed):
+    main = importFrom(UNSUPERVISE, 'main', 'unsupervise_main')
+    PCA = importFrom(UNSUPERVISE, 'PCA', 'PCA')
+    file = os.path.join(workspace['directory'], 'kmeans-{}.npy'.format(rows))
+    store.write(file, [PCA.PrincipalComponentAnalysis(0.99, dtype=workspace['dtype']).fit_transform(
+        standardizedWine(rows, seed, workspace['dtype']))])
+    np.random.seed(seed)
+    return lambda: main.clusterKMeans(3, store.load(file))  # 每轮按块顺序读取
+
+
+@case('silhouette', 'wine')
+def _(workspace, rows, seed):
+    main = importFrom(UNSUPERVISE, 'main', 'unsupervise_main')
+    PCA = importFrom(UNSUPERVISE, 'PCA', 'PCA')
+    data = PCA.PrincipalComponentAnalysis(0.99, dtype=workspace['dtype']).fit_transform(
+        standardizedWine(rows, seed, workspace['dtype']))
+    np.random.seed(seed)
+    cluster, centroids = main.clusterKMeans(3, data)
+    return lambda: main.silhouetteCoefficient(data, cluster, centroids)
+
+
+def runCase(prepare, workspace, rows, seed, repeat, connection):
+    '''
+    在子进程中运行一个基准项目，通过管道返回最短耗时与峰值内存
+    '''
+    try:
+        importFrom(SUPERVISE, 'progress', 'progress').configure(
+            quiet=True)  # 计时时不显示进度条
+        stats = instrument.Stats()
+        run = prepare(dict(workspace, stats=stats), rows, seed)
+        run, items = run if isinstance(run, tuple) else (run, rows)
+        seconds = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            seconds = min(seconds, time.perf_counter() - start)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform != 'darwin':
+            peak *= 1024  # Linux 以 KiB 为单位
+        outcome = {'seconds': seconds, 'peakMemory': int(peak),
+                   'throughput': items / seconds if seconds > 0 else float('inf')}
+        if stats.timings:
+            outcome['stages'] = {name: total / stats.calls[name]
+                                 for name, total in stats.timings.items()}  # 每次运行的平均耗时
+        if stats.series:
+            outcome['series'] = {name: values[-1]
+                                 for name, values in stats.series.items()}  # 如近似检索的召回率
+        connection.send(outcome)
+    except Exception as error:
+        connection.send({'error': '{}: {}'.format(
+            type(error).__name__, error)})
+    finally:
+        connection.close()
+
+
+def benchmark(sizes, seed=0, repeat=1, limits=LIMITS, only=None, dtype='float64'):
+    '''
+    运行全部基准项目
+    =============
+    Arguments
+    ---------
+    - `sizes` 数据规模列表
+    - `seed` 随机数种子
+    - `repeat` 每项重复次数，取最短耗时
+    - `limits` 各项目的最大规模
+    - `only` 仅运行名称在其中的项目，`None` 表示全部
+    - `dtype` 浮点类型
+
+    Returns
+    -------
+    - 结果列表，每项包含名称、规模、浮点类型、耗时、峰值内存与吞吐量
+    '''
+    context = multiprocessing.get_context('fork')
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            workspace = {'student': os.path.join(directory, 'student-{}.csv'.format(rows)),
+                         'wine': os.path.join(directory, 'wine-{}.data'.format(rows)),
+                         'directory': directory, 'dtype': dtype}
+            writeStudent(workspace['student'], *syntheticStudent(rows, seed))
+            writeWine(workspace['wine'], *syntheticWine(rows, seed))
+
+            for name, dataset, prepare in CASES:
+                if only is not None and name not in only:
+                    continue
+                result = {'name': name, 'dataset': dataset,
+                          'rows': rows, 'dtype': dtype}
+                if rows > limits.get(name, float('inf')):
+                    result['skipped'] = 'rows above limit {}'.format(
+                        limits[name])
+                    print('{:18} {:>9} rows  {}'.format(
+                        name, rows, result['skipped']), flush=True)
+                    results.append(result)
+                    continue
+
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=runCase, args=(
+                    prepare, workspace, rows, seed, repeat, sender))
+                process.start()
+                sender.close()
+                try:
+                    outcome = receiver.recv()
+                except EOFError:
+                    outcome = {'error': 'worker exited with code {}'.format(
+                        process.exitcode)}
+                process.join()
+                result.update(outcome)
+                print('{:18} {:>9} rows  {}'.format(name, rows, '{:.4f}s  {:.1f} MiB'.format(
+                    result['seconds'], result['peakMemory'] / 2**20) if 'seconds' in result else
+                    result.get('error', result.get('skipped'))), flush=True)
+                results.append(result)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    '''
+    与基线结果比较
+    ============
+    Arguments
+    ---------
+    - `results` 本次结果
+    - `baseline` 基线结果
+    - `tolerance` 允许的相对耗时增长
+
+    Returns
+    -------
+    - 耗时超过基线 `1 + tolerance` 倍的项目列表 `(名称, 规模, 基线耗时, 本次耗时)`
+    '''
+    reference = {(result['name'], result['rows'], result.get('dtype', 'float64')): result
+                 for result in baseline['results'] if 'seconds' in result}
+    regressions = []
+    for result in results:
+        old = reference.get(
+            (result['name'], result['rows'], result.get('dtype', 'float64')))
+        if old is None or 'seconds' not in result:
+            continue
+        if result['seconds'] > old['seconds'] * (1 + tolerance):
+            regressions.append(
+                (result['name'], result['rows'], old['seconds'], result['seconds']))
+    return regressions
+
+
+def agreement(a, b):
+    '''
+    两组预测标签的一致率
+    '''
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def precision(rows, seed=0):
+    '''
+    比较 float32 与 float64 的精度
+    ==========================
+    在同一份合成数据上分别以两种浮点类型训练与推断
+
+    Arguments
+    ---------
+    - `rows` 训练集观测数，SVM 的训练集不超过 `LIMITS['SVM.train']`
+    - `seed` 随机数种子
+
+    Returns
+    -------
+    - 结果列表，每项包含名称、决策函数值（降维结果）的最大绝对偏差、预测标签（聚类）的一致率，
+      分类器另有两种浮点类型的 F1 值
+    '''
+    importFrom(SUPERVISE, 'progress', 'progress').configure(quiet=True)
+    estimator = importFrom(SUPERVISE, 'estimator', 'estimator')
+    metrics = importFrom(SUPERVISE, 'metrics', 'metrics')
+    main = importFrom(UNSUPERVISE, 'main', 'unsupervise_main')
+    PCA = importFrom(UNSUPERVISE, 'PCA', 'PCA')
+
+    results = []
+    for name, params, normalize, limit in [('KNN', {'K': 27}, False, None),
+                                           ('LR', {'iteration': 20}, False, None),
+                                           ('SVM', {'kernel': 'Gaussian', 'sigma': 10}, True,
+                                            LIMITS['SVM.train'])]:
+        n = rows if limit is None else min(rows, limit)
+        trainData, trainLabel = studentFeatures(
+            *syntheticStudent(n, seed), normalize=normalize)
+        testData, testLabel = studentFeatures(
+            *syntheticStudent(TEST_ROWS, seed + 1), normalize=normalize)
+        outputs = {}
+        for dtype in ('float64', 'float32'):
+            model = estimator.create(name, dtype=dtype, **params).fit(
+                trainData.astype(dtype), trainLabel)
+            outputs[dtype] = (model.decision_function(testData.astype(dtype)),
+                              model.predict(testData.astype(dtype)))
+        (score64, label64), (score32, label32) = outputs['float64'], outputs['float32']
+        results.append({
+            'name': name, 'rows': n,
+            'maxAbsDifference': float(np.max(np.abs(score64.astype(np.float64) - score32))),
+            'agreement': agreement(label64, label32),
+            'f1': {dtype: metrics.ConfusionMatrix(positive=1).update(testLabel, label).f1()
+                   for dtype, (_, label) in outputs.items()},
+        })
+
+    n = rows
+    data = standardizedWine(n, seed)
+    projections, clusters = {}, {}
+    for dtype in ('float64', 'float32'):
+        projections[dtype] = PCA.PrincipalComponentAnalysis(
+            0.99, dtype=dtype).fit_transform(data.astype(dtype))
+        np.random.seed(seed)  # 两种浮点类型使用相同的初始质心
+        clusters[dtype], _ = main.clusterKMeans(3, projections[dtype])
+    if projections['float64'].shape == projections['float32'].shape:
+        difference = float(np.max(np.abs(
+            projections['float64'] - projections['float32'].astype(np.float64))))
+    else:  # 舍入误差使选取的主成分数目不同
+        difference = float('inf')
+    results.append({'name': 'PCA', 'rows': n, 'maxAbsDifference': difference,
+                    'agreement': 1.0 if np.isfinite(difference) else 0.0})
+    results.append({'name': 'KMeans', 'rows': n, 'maxAbsDifference': None,
+                    'agreement': main.clusterTest(clusters['float64'], clusters['float32'])[1]})  # 调整兰德指数
+    return results
+
+
+if __name__ == "__main__":
+    # 命令行参数分析
+    parser = argparse.ArgumentParser(
+        description='Benchmark of training and inference paths', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-n', '--sizes', metavar='rows', nargs='+', type=int, default=[1000, 10000],
+                        help='Numbers of synthetic rows')
+    parser.add_argument('-r', '--repeat', default=1, type=int,
+                        help='Repetitions of each case, the fastest one is recorded')
+    parser.add_argument('-s', '--seed', default=0, type=int,
+                        help='Random seed of synthetic data')
+    parser.add_argument('-c', '--cases', metavar='name', nargs='+', default=None,
+                        help='Only run these cases')
+    parser.add_argument('--no-limits', dest='limits', action='store_false',
+                        help='Run O(n^2) cases at every size')
+    parser.add_argument('-o', '--output', metavar='file', default='benchmark.json',
+                        help='JSON file of results')
+    parser.add_argument('-b', '--baseline', metavar='file', default=None,
+                        help='JSON file of baseline results to compare against')
+    parser.add_argument('-t', '--tolerance', default=0.2, type=float,
+                        help='Allowed relative slowdown against the baseline')
+    parser.add_argument('-d', '--dtype', default='float64', choices=['float64', 'float32'],
+                        help='Floating point type of every case')
+    parser.add_argument('--precision', action='store_true',
+                        help='Compare float32 against float64 instead of timing')
+    parser.add_argument('--min-agreement', metavar='ratio', dest='minAgreement', default=0.99, type=float,
+                        help='Minimum agreement of float32 predictions with float64 in --precision mode')
+
+    args = parser.parse_args()
+
+    if args.precision:
+        checks = []
+        for rows in args.sizes:
+            for check in precision(rows, seed=args.seed):
+                print('{:8} {:>9} rows  max |diff| {:<24} agreement {:.4f}{}'.format(
+                    check['name'], check['rows'], str(check['maxAbsDifference']), check['agreement'],
+                    '  F1 {float64:.6f} / {float32:.6f}'.format(**check['f1']) if 'f1' in check else ''))
+                checks.append(check)
+        with open(args.output, 'w') as fileStream:
+            json.dump({'meta': {'numpy': np.__version__, 'seed': args.seed, 'sizes': args.sizes},
+                       'precision': checks}, fileStream, indent=2)
+        print('results written to ' + args.output)
+        sys.exit(1 if any(check['agreement'] < args.minAgreement for check in checks) else 0)
+
+    results = benchmark(args.sizes, seed=args.seed, repeat=args.repeat,
+                        limits=LIMITS if args.limits else {}, only=args.cases, dtype=args.dtype)
+
+    with open(args.output, 'w') as fileStream:
+        json.dump({
+            'meta': {
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+                'sizes': args.sizes,
+                'dtype': args.dtype,
+            },
+            'results': results,
+        }, fileStream, indent=2)
+    print('results written to ' + args.output)
+
+    if args.baseline is not None:
+        with open(args.baseline, 'r') as fileStream:
+            regressions = compare(results, json.load(fileStream), args.tolerance)
+        for name, rows, old, new in regressions:
+            print('regression: {} at {} rows {:.4f}s -> {:.4f}s'.format(name, rows, old, new))
+        if regressions:
+            sys.exit(1)
+        print('no regression against ' + args.baseline)
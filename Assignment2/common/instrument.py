@@ -0,0 +1,242 @@
+'''
+instrument
+===
+    热点路径的分阶段计时与算法计数
+Provides
+--------
+- 统计对象，由各算法在阶段或迭代粒度上记录（未启用时算法中的 `stats` 为 `None`，仅有一次判断的开销）::
+
+    >>> stats = Stats(trace=True)
+    >>> model.stats = stats
+    >>> model.fit(trainData, trainLabel)
+    >>> print(stats.report())
+
+- 导出 JSON 或 Chrome 跟踪格式（可在 chrome://tracing 或 Perfetto 中查看）::
+
+    >>> stats.dump('stats.json')
+    >>> stats.dumpTrace('trace.json')
+
+- 使用 cProfile 剖析一段代码::
+
+    >>> with profile('main.prof'): ...
+
+'''
+
+import contextlib
+import cProfile
+import json
+import os
+import time
+from collections import defaultdict
+
+
+class Stats:
+    '''
+    分阶段计时与计数
+    =============
+    Methods
+    -------
+    - `add(name, start, end=None)` 累计阶段耗时
+    - `count(name, n=1)` 累计计数器
+    - `record(name, value)` 记录序列值，如每轮迭代的损失
+    - `stage(name)` 计时的上下文管理器
+    - `asDict()` 结构化的统计结果
+    - `report()` 文本形式的统计结果
+    - `dump(file)` 导出 JSON
+    - `dumpTrace(file)` 导出 Chrome 跟踪格式
+    '''
+
+    def __init__(self, trace=False):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `trace` 是否保留每个阶段的起止时间以导出跟踪
+        '''
+
+        self.timings = defaultdict(float)  # 阶段 -> 累计耗时
+        self.calls = defaultdict(int)  # 阶段 -> 次数
+        self.counters = defaultdict(int)  # 计数器
+        self.series = defaultdict(list)  # 序列值
+        self.events = [] if trace else None  # 跟踪事件 (名称, 开始, 结束)
+        self.origin = time.perf_counter()
+
+    def add(self, name, start, end=None):
+        '''
+        累计阶段耗时
+        ==========
+        Arguments
+        ---------
+        - `name` 阶段名称
+        - `start` 由 `time.perf_counter()` 得到的开始时间
+        - `end` 结束时间，缺省为当前时间
+        '''
+        if end is None:
+            end = time.perf_counter()
+        self.timings[name] += end - start
+        self.calls[name] += 1
+        if self.events is not None:
+            self.events.append((name, start, end))
+
+    def count(self, name, n=1):
+        '''
+        累计计数器
+        '''
+        self.counters[name] += n
+
+    def record(self, name, value):
+        '''
+        记录序列值
+        '''
+        self.series[name].append(value)
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        '''
+        计时的上下文管理器
+        ===============
+        Arguments
+        ---------
+        - `name` 阶段名称
+        '''
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(name, start)
+
+    def asDict(self):
+        '''
+        结构化的统计结果
+        =============
+        Returns
+        -------
+        - 包含 `timings`、`calls`、`counters`、`series` 的字典
+        '''
+        return {
+            'timings': dict(self.timings),
+            'calls': dict(self.calls),
+            'counters': dict(self.counters),
+            'series': {name: list(values) for name, values in self.series.items()},
+        }
+
+    def report(self):
+        '''
+        文本形式的统计结果
+        ===============
+        Returns
+        -------
+        - 多行字符串
+        '''
+        lines = []
+        for name in sorted(self.timings):
+            lines.append('{:28} {:>10.4f}s  x{}'.format(
+                name, self.timings[name], self.calls[name]))
+        for name in sorted(self.counters):
+            lines.append('{:28} {:>11}'.format(name, self.counters[name]))
+        for name in sorted(self.series):
+            values = self.series[name]
+            lines.append('{:28} {:>11} values, last {}'.format(
+                name, len(values), values[-1] if values else None))
+        return '\n'.join(lines)
+
+    def dump(self, file):
+        '''
+        导出 JSON
+        ========
+        Arguments
+        ---------
+        - `file` 文件路径
+        '''
+        with open(file, 'w') as fileStream:
+            json.dump(self.asDict(), fileStream, indent=2)
+
+    def dumpTrace(self, file):
+        '''
+        导出 Chrome 跟踪格式
+        =================
+        Arguments
+        ---------
+        - `file` 文件路径，需在构造时指定 `trace=True`
+        '''
+        if self.events is None:
+            raise ValueError('stats were created without trace=True')
+        pid = os.getpid()
+        with open(file, 'w') as fileStream:
+            json.dump({'traceEvents': [{
+                'name': name, 'ph': 'X', 'pid': pid, 'tid': 0,
+                'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6,
+            } for name, start, end in self.events]}, fileStream)
+
+
+@contextlib.contextmanager
+def profile(file):
+    '''
+    使用 cProfile 剖析一段代码
+    =======================
+    Arguments
+    ---------
+    - `file` pstats 文件路径，`None` 表示不剖析
+
+    Returns
+    -------
+    - 上下文管理器
+    '''
+    if file is None:
+        yield None
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(file)
+
+
+def addArguments(parser):
+    '''
+    为命令行添加统计相关参数
+    ====================
+    Arguments
+    ---------
+    - `parser` `argparse.ArgumentParser`
+    '''
+    group = parser.add_argument_group('Instrumentation')
+    group.add_argument('--stats', action='store_true',
+                       help='Print per-stage timings and algorithm counters')
+    group.add_argument('--stats-output', metavar='file', dest='statsOutput', default=None,
+                       help='Export per-stage timings and algorithm counters to a JSON file')
+    group.add_argument('--trace', metavar='file', default=None,
+                       help='Export stage events in Chrome trace format')
+    group.add_argument('--profile', metavar='file', default=None,
+                       help='Dump a cProfile profile of the run')
+
+
+def fromArguments(args):
+    '''
+    由命令行参数创建统计对象
+    ====================
+    Returns
+    -------
+    - 需要统计时为 `Stats`，否则为 `None`
+    '''
+    if args.stats or args.statsOutput is not None or args.trace is not None:
+        return Stats(trace=args.trace is not None)
+    return None
+
+
+def export(stats, args):
+    '''
+    按命令行参数输出统计结果
+    ====================
+    '''
+    if stats is None:
+        return
+    if args.stats:
+        print(stats.report())
+    if args.statsOutput is not None:
+        stats.dump(args.statsOutput)
+    if args.trace is not None:
+        stats.dumpTrace(args.trace)
@@ -0,0 +1,109 @@
+'''
+store
+===
+    以内存映射的 `.npy` 文件保存大于内存的数据矩阵
+Provides
+--------
+- 逐块写入数据矩阵，行数无需预先知道，只进行顺序写::
+
+    >>> write('train.npy', (chunk for chunk in chunks))
+
+- 以只读内存映射打开，算法按块顺序读取，常驻内存的只有当前块::
+
+    >>> data = load('train.npy')
+    >>> model.fit(data, labels)
+
+- 按块遍历数据矩阵::
+
+    >>> for begin, block in blocks(data, rows=65536): ...
+
+Notes
+-----
+- 文件为标准的 `.npy` 格式，也可由 `np.lib.format.open_memmap` 生成或以 `np.load` 读取
+'''
+
+import numpy as np
+
+HEADER_BYTES = 128  # 预留的文件头长度，写完数据后回填行数
+BLOCK_ROWS = 65536  # 缺省的每块行数
+
+
+def writeHeader(stream, dtype, shape):
+    '''
+    在文件开头写入 1.0 版本的 `.npy` 文件头，并以空格补齐到 `HEADER_BYTES` 字节
+    '''
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype),
+                   'fortran_order': False, 'shape': tuple(shape)})
+    prefix = np.lib.format.magic(1, 0)
+    length = HEADER_BYTES - len(prefix) - 2  # 文件头字典（含换行）的长度
+    if len(header) + 1 > length:
+        raise ValueError('shape {} does not fit in the .npy header'.format(shape))
+    stream.seek(0)
+    stream.write(prefix + length.to_bytes(2, 'little') +
+                 (header.ljust(length - 1) + '\n').encode('latin1'))
+
+
+def write(file, chunks, dtype=None):
+    '''
+    逐块写入数据矩阵
+    =============
+    Arguments
+    ---------
+    - `file` `.npy` 文件路径
+    - `chunks` 产生二维数组的可迭代对象，各块的列数相同
+    - `dtype` 保存的浮点类型，缺省为第一块的类型
+
+    Returns
+    -------
+    - 数据矩阵的形状
+    '''
+    rows = 0
+    columns = None
+    with open(file, 'wb') as stream:
+        stream.write(b' ' * HEADER_BYTES)  # 预留文件头
+        for chunk in chunks:
+            chunk = np.atleast_2d(np.asarray(chunk))
+            if dtype is None:
+                dtype = chunk.dtype
+            if columns is None:
+                columns = chunk.shape[1]
+            elif chunk.shape[1] != columns:
+                raise ValueError('chunk has {} columns, expected {}'.format(
+                    chunk.shape[1], columns))
+            stream.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+            rows += chunk.shape[0]
+        shape = (rows, columns or 0)
+        writeHeader(stream, np.dtype(dtype or np.float64), shape)
+    return shape
+
+
+def load(file):
+    '''
+    以只读内存映射打开数据矩阵
+    ======================
+    Arguments
+    ---------
+    - `file` `.npy` 文件路径
+
+    Returns
+    -------
+    - `np.memmap`
+    '''
+    return np.load(file, mmap_mode='r')
+
+
+def blocks(data, rows=BLOCK_ROWS):
+    '''
+    按块顺序遍历数据矩阵
+    =================
+    Arguments
+    ---------
+    - `data` 数据矩阵（数组或内存映射）
+    - `rows` 每块行数
+
+    Returns
+    -------
+    - 产生 `(起始行, 数据块)` 的生成器，内存映射的数据块读入内存
+    '''
+    for begin in range(0, data.shape[0], rows):
+        yield begin, np.asarray(data[begin:begin + rows])
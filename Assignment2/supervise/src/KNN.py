@@ -4,38 +4,36 @@ KNN(k-Nearest Neighbors)
     使用k-近邻算法预测分类标签
 Provides
 ---------
+- k-近邻分类器类::
+
+    >>> knn = NearestNeighborsClassifier(K=27, metric='Manhattan', dtype='float64')
+
+- 在训练集`trainData`及训练集标签`trainLabel`上拟合模型::
+
+    >>> knn.fit(trainData, trainLabel)
+
+- 批量预测测试数据集`testData`的分类标签::
+
+    >>> knn.predict(testData)
+
+- 近似检索模式，以倒排文件索引(`'ivf'`)或局部敏感哈希(`'lsh'`)代替线性扫描，并报告相对精确检索的召回率::
+
+    >>> knn = NearestNeighborsClassifier(K=27, index='ivf', probes=8).fit(trainData, trainLabel)
+    >>> recall(knn, testData)
+
 - 使用训练集`trainData`及训练集标签`trainLabel`，预测测试数据集`testData`的分类标签::
 
     >>> predict(trainData, trainLabel, testData, K=27)
 
 '''
 
-import numpy as np
-from rich.progress import (
-    BarColumn,
-    TimeRemainingColumn,
-    Progress,
-    TaskID,
-)  # 进度条
-
+import time
 
-def distanceBetween(j, q):
-    '''
-    计算向量间 Minkowski 距离
-    ======================
-    Arguments
-    ---------
-    - `j` 向量 $x_{j}$
-    - `q` 向量 $x_{q}$
+import numpy as np
 
-    Returns
-    -------
-    - 向量间 Minkowski 距离 $(\sum_{i}|x_{j,i} - x_{q,i}|^p)^{1/p}$
-        - $p = 2$ 欧几里得距离
-        - $p = 1$ 曼哈顿距离
-    '''
-    # return np.sqrt(np.sum(np.square(j - q)))  # p = 2 : Euclidean metric
-    return np.sum(np.abs(j - q))  # p = 1 : Manhattan distance
+import neighbors
+import progress  # 进度条
+from estimator import Estimator, register
 
 
 def NearestNeighbor(trainData, trainLabel, testDatum, K):
@@ -54,15 +52,197 @@ def NearestNeighbor(trainData, trainLabel, testDatum, K):
     - 预测标签
     '''
 
-    Distances = np.array([distanceBetween(trainDatum, testDatum)
-                          for trainDatum in trainData])  # 向量间距离
+    return NearestNeighborsClassifier(K).fit(trainData, trainLabel).predict([testDatum])[0]
+
+
+@register('KNN')
+class NearestNeighborsClassifier(Estimator):
+    '''
+    k-近邻分类器
+    ==========
+    Methods
+    -------
+    - `fit(trainData, trainLabel)` 拟合模型
+    - `neighbors(testData)` k-近邻的下标
+    - `decision_function(testData)` 近邻中各类别的比例
+    - `predict(testData)` 预测类别
+    '''
+
+    normalize = False
+    methods = 'NearestNeighbors'
+
+    def __init__(self, K=27, metric='Manhattan', dtype='float64', index=None, lists=None, probes=8,
+                 tables=16, hashes=4, width=None, seed=0):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `K` 最近邻样本数目
+        - `metric` 距离，`'Manhattan'` 或 `'Euclidean'`
+        - `dtype` 浮点类型，`'float64'` 或 `'float32'`
+        - `index` 近似检索的索引，`None` 为精确检索，`'ivf'` 为倒排文件索引，`'lsh'` 为局部敏感哈希
+        - `lists`、`probes` 倒排表数目与每次查询检索的倒排表数目，见 `neighbors.InvertedFileIndex`
+        - `tables`、`hashes`、`width` 哈希表数目、每张表的哈希函数数目与桶宽，见 `neighbors.HashIndex`
+        - `seed` 建立索引的随机数种子，加载模型时以相同的种子重建索引
+        '''
 
-    topK_Neighbors = np.argpartition(Distances, K)[:K]  # k-近邻
+        self.K = K
+        self.metric = metric
+        self.dtype = np.dtype(dtype)
+        self.index = index
+        self.lists = lists
+        self.probes = probes
+        self.tables = tables
+        self.hashes = hashes
+        self.width = width
+        self.seed = seed
 
-    labelList = [0, 0]  # 0 : failed  1 : passed
-    for x in topK_Neighbors:
-        labelList[int(trainLabel[x])] += 1  # 统计标签为对应类别的近邻数
-    return labelList.index(max(labelList))  # 返回具有最多相同近邻数的标签
+    def fit(self, trainData, trainLabel):
+        '''
+        拟合模型
+        ======
+        Arguments
+        ---------
+        - `trainData` 训练集数据；内存映射的 `.npy` 文件（`np.memmap`）不会读入内存，检索时按块顺序读取
+        - `trainLabel` 训练集标签
+
+        Returns
+        -------
+        - `self`
+        '''
+        if isinstance(trainData, np.memmap):
+            self.__x = trainData  # 逐块转换为 `dtype`
+        else:
+            self.__x = np.asarray(trainData, dtype=self.dtype)
+        self.classes, self.__y = np.unique(
+            np.asarray(trainLabel), return_inverse=True)  # 类别编码为 0, 1, ...
+        self.__y = self.__y.ravel()
+        self.__buildIndex()
+        return self
+
+    def __buildIndex(self):
+        start = time.perf_counter()
+        if self.index == 'ivf':
+            self.__index = neighbors.InvertedFileIndex(
+                self.lists, self.probes, self.metric, self.seed).fit(self.__x)
+        elif self.index == 'lsh':
+            self.__index = neighbors.HashIndex(
+                self.tables, self.hashes, self.width, self.metric, self.seed).fit(self.__x)
+        elif self.index is None:
+            self.__index = None
+        else:
+            raise ValueError('unknown index ' + str(self.index))
+        if self.stats is not None and self.__index is not None:
+            self.stats.add('KNN.index', start)
+
+    def neighbors(self, testData, exact=False):
+        '''
+        k-近邻的下标
+        ==========
+        Arguments
+        ---------
+        - `testData` 测试数据集
+        - `exact` 是否忽略索引，使用精确检索
+
+        Returns
+        -------
+        - 第 i 行为测试样本 i 的 k-近邻在训练集中的下标（不排序）
+        '''
+        testData = np.atleast_2d(np.asarray(testData, dtype=self.dtype))
+        if self.__index is None or exact:
+            result = neighbors.exactNeighbors(
+                self.__x, testData, self.K, self.metric)
+            distances = testData.shape[0] * self.__x.shape[0]
+        else:
+            result, distances = self.__index.search(testData, self.K)
+        if self.stats is not None:
+            self.stats.count('KNN.distances', distances)
+        return result
+
+    def votes(self, testData):
+        '''
+        统计近邻中各类别的数目
+        ===================
+        Arguments
+        ---------
+        - `testData` 测试数据集
+
+        Returns
+        -------
+        - 第 i 行第 c 列为测试样本 i 的 k-近邻中类别 `classes[c]` 的数目
+        '''
+        start = time.perf_counter()
+        topK_Neighbors = self.neighbors(testData)  # k-近邻
+        neighborLabel = self.__y[topK_Neighbors]
+        rows = np.repeat(
+            np.arange(topK_Neighbors.shape[0]), topK_Neighbors.shape[1])
+        result = np.zeros(
+            [topK_Neighbors.shape[0], self.classes.size], dtype=np.int64)
+        np.add.at(result, (rows, neighborLabel.ravel()), 1)  # 统计标签为对应类别的近邻数
+        if self.stats is not None:
+            self.stats.add('KNN.votes', start)
+            self.stats.count('KNN.queries', topK_Neighbors.shape[0])
+        return result
+
+    def decision_function(self, testData):
+        '''
+        近邻中各类别的比例
+        ===============
+        Arguments
+        ---------
+        - `testData` 测试数据集
+
+        Returns
+        -------
+        - 二分类时为近邻中正类的比例，否则为各类别比例的矩阵
+        '''
+        fraction = self.votes(testData) / min(self.K, self.__x.shape[0])
+        return fraction[:, -1] if self.classes.size == 2 else fraction
+
+    def predictFromDecision(self, decision):
+        '''
+        由近邻中各类别的比例得到类别
+        ========================
+        Arguments
+        ---------
+        - `decision` `decision_function` 的结果
+
+        Returns
+        -------
+        - 具有最多相同近邻数的标签，数目相同时取较小的标签
+        '''
+        if decision.ndim == 2:
+            return self.classes[np.argmax(decision, axis=1)]
+        return self.classes[(decision > 0.5).astype(int)]  # 正类比例恰为一半时取较小的标签
+
+    def getParams(self):
+        return {'K': self.K, 'metric': self.metric, 'dtype': self.dtype.name, 'index': self.index,
+                'lists': self.lists, 'probes': self.probes, 'tables': self.tables, 'hashes': self.hashes,
+                'width': self.width, 'seed': self.seed}
+
+    def getState(self):
+        return {'x': self.__x, 'y': self.__y, 'classes': self.classes}
+
+    def setState(self, state):
+        self.__x, self.__y, self.classes = state['x'], state['y'], state['classes']
+        self.__buildIndex()  # 索引由训练数据与种子确定，加载时重建
+
+
+def recall(model, testData):
+    '''
+    近似检索相对精确检索的召回率
+    ========================
+    Arguments
+    ---------
+    - `model` 已拟合的 `NearestNeighborsClassifier`
+    - `testData` 测试数据集
+
+    Returns
+    -------
+    - 精确 k-近邻中被近似检索找到的比例
+    '''
+    return neighbors.recall(model.neighbors(testData), model.neighbors(testData, exact=True))
 
 
 def predict(trainData, trainLabel, testData, K=27):
@@ -81,23 +261,17 @@ def predict(trainData, trainLabel, testData, K=27):
     - `predictLabel` 预测标签
     '''
     predictLabel = []
+    classifier = NearestNeighborsClassifier(K).fit(trainData, trainLabel)
 
-    progress = Progress(
-        "[progress.description]{task.description}",
-        BarColumn(bar_width=None),
-        "[progress.percentage]{task.completed}/{task.total}",
-        "•",
-        TimeRemainingColumn(),
-    )  # rich 进度条
-    progress.start()
-
-    testTask = progress.add_task(
-        "[cyan]predicting...", total=len(testData))
+    testTask = progress.bar(
+        "[cyan]predicting...", total=len(testData))  # 进度条
 
-    for x in testData:
-        predictLabel.append(NearestNeighbor(
-            trainData, trainLabel, x, K))  # 预测标签分类
-        progress.update(testTask, advance=1)
+    testData = np.asarray(testData, dtype=float)
+    blockSize = 64
+    for start in range(0, testData.shape[0], blockSize):
+        block = testData[start:start + blockSize]
+        predictLabel.extend(classifier.predict(block))  # 预测标签分类
+        testTask.advance(block.shape[0])
 
-    progress.stop()
+    testTask.close()
     return predictLabel
@@ -6,42 +6,63 @@ Provides
 --------
 - Logistic 回归分类器类::
 
-    >>> lr = LogisticRegressionClassifier(iteration=200, learning_rate=0.0001)
+    >>> lr = LogisticRegressionClassifier(iteration=200, learning_rate=0.0001, dtype='float64')
 
 - 在训练集`trainData`及训练集标签`trainLabel`上训练模型::
 
     >>> lr.train(trainData, trainLabel)
 
+- 以新到达的数据批次增量更新已有权重，学习速率可按轮次衰减或使用 AdaGrad/Adam 自适应调整::
+
+    >>> lr = LogisticRegressionClassifier(learning_rate=0.01, schedule='adam')
+    >>> lr.partial_fit(batch, batchLabel, classes=[0, 1])
+
+- 保存与恢复权重及优化器状态，之后可继续增量更新::
+
+    >>> lr.save('lr.npz')
+    >>> lr = estimator.load('lr.npz')
+
 - 预测测试数据`testDatum`的分类标签::
 
     >>> lr.classify(testDatum)
 
+- 批量预测测试数据集`testData`的分类标签::
+
+    >>> lr.predict(testData)
+
 - 使用训练集`trainData`及训练集标签`trainLabel`，预测测试数据集`testData`的分类标签::
 
     >>> predict(trainData, trainLabel, testData, iteration=200, learning_rate=0.0001)
 
 '''
 
+import time
+
 import numpy as np
-from rich.progress import (
-    BarColumn,
-    TimeRemainingColumn,
-    Progress,
-    TaskID,
-)  # 进度条
 
+import progress  # 进度条
+from estimator import Estimator, register
 
-class LogisticRegressionClassifier:
+
+@register('LR')
+class LogisticRegressionClassifier(Estimator):
     '''
     Logistic 回归分类器
     ========
     Methods
     -------
-    - `train(trainData, trainLabel)` 训练模型
+    - `train(trainData, trainLabel)` 训练模型，同 `fit`
+    - `partial_fit(trainData, trainLabel, classes=None)` 以一个数据批次增量更新
     - `classify(testDatum)` 预测类别
+    - `decision_function(testData)` 批量计算正类概率
+    - `predict(testData)` 批量预测类别
     '''
 
-    def __init__(self, iteration=200, learning_rate=0.0001):
+    normalize = False
+    methods = 'LogisticRegression'
+
+    def __init__(self, iteration=200, learning_rate=0.0001, dtype='float64', schedule='constant',
+                 decay=0.001, beta1=0.9, beta2=0.999):
         '''
         类构造函数
         ========
@@ -49,14 +70,96 @@ class LogisticRegressionClassifier:
         ---------
         - `iteration` 迭代次数
         - `learning_rate` 学习速率
+        - `dtype` 浮点类型，`'float64'` 或 `'float32'`
+        - `schedule` 学习速率的调整方式
+            - `'constant'` 固定学习速率
+            - `'decay'` 随更新次数 t 衰减为 learning_rate / (1 + decay * t)
+            - `'adagrad'` AdaGrad，按各分量累计的梯度平方和缩放
+            - `'adam'` Adam，使用梯度的一阶与二阶矩估计
+        - `decay` `'decay'` 的衰减系数
+        - `beta1` Adam 一阶矩的衰减率
+        - `beta2` Adam 二阶矩的衰减率
         '''
 
+        if schedule not in ('constant', 'decay', 'adagrad', 'adam'):
+            raise ValueError('unknown schedule ' + str(schedule))
         self.__alpha = learning_rate
         self.__iteration = iteration
+        self.dtype = np.dtype(dtype)
+        self.__schedule = schedule
+        self.__decay = decay
+        self.__beta1 = beta1
+        self.__beta2 = beta2
+        self.__weights = None  # 未训练
 
     def __sigmoid(self, x):
         return 1 / (1 + np.exp(-x))
 
+    def __reset(self, features, classes):
+        '''
+        初始化权重与优化器状态
+        ==================
+        Arguments
+        ---------
+        - `features` 属性数目
+        - `classes` 类别
+        '''
+        self.classes = np.unique(classes)
+        if self.classes.size > 2:
+            raise ValueError('logistic regression only supports two classes')
+        self.__weights = np.zeros(
+            features + 1, dtype=self.dtype)  # 初始化分类器权重，含哑变量
+        self.__steps = 0  # 已更新的次数
+        self.__moment = np.zeros_like(self.__weights)  # Adam 一阶矩
+        self.__accumulator = np.zeros_like(
+            self.__weights)  # AdaGrad 梯度平方和，或 Adam 二阶矩
+
+    def __prepare(self, trainData, trainLabel):
+        x = np.insert(np.array(trainData).astype(
+            self.dtype), 0, values=1.0, axis=1)  # 训练数据，增加哑变量
+        y = (np.array(trainLabel) == self.classes[-1]).astype(
+            self.dtype)  # 训练样本，较大的标签为正类
+        return x, y
+
+    def __epoch(self, x, y):
+        '''
+        逐个样本随机梯度下降一轮
+        ====================
+        Formula
+        -------
+            g = -(y - h) h (1 - h) x，平方误差损失的梯度
+            constant: w = w - alpha g
+            decay:    w = w - alpha / (1 + decay t) g
+            adagrad:  G = G + g^2, w = w - alpha g / (sqrt(G) + eps)
+            adam:     m = b1 m + (1 - b1) g, v = b2 v + (1 - b2) g^2,
+                      w = w - alpha m / (1 - b1^t) / (sqrt(v / (1 - b2^t)) + eps)
+        '''
+        for i in range(x.shape[0]):
+            h = self.__sigmoid(np.dot(x[i], self.__weights))
+            self.__steps += 1
+            if self.__schedule == 'constant':
+                self.__weights += self.__alpha * \
+                    (y[i] - h) * h * (1 - h) * x[i]  # 更新权重
+                continue
+            gradient = -(y[i] - h) * h * (1 - h) * x[i]
+            if self.__schedule == 'decay':
+                self.__weights -= self.__alpha / \
+                    (1 + self.__decay * self.__steps) * gradient
+            elif self.__schedule == 'adagrad':
+                self.__accumulator += np.square(gradient)
+                self.__weights -= self.__alpha * gradient / \
+                    (np.sqrt(self.__accumulator) + 1e-8)
+            else:
+                self.__moment = self.__beta1 * self.__moment + \
+                    (1 - self.__beta1) * gradient
+                self.__accumulator = self.__beta2 * self.__accumulator + \
+                    (1 - self.__beta2) * np.square(gradient)
+                moment = self.__moment / (1 - self.__beta1**self.__steps)  # 偏差修正
+                accumulator = self.__accumulator / \
+                    (1 - self.__beta2**self.__steps)
+                self.__weights -= self.__alpha * moment / \
+                    (np.sqrt(accumulator) + 1e-8)
+
     def train(self, trainData, trainLabel):
         '''
         训练
@@ -69,31 +172,109 @@ class LogisticRegressionClassifier:
         Returns
         -------
         '''
-        self.__x = np.insert(np.array(trainData).astype(
-            float), 0, values=1.0, axis=1)  # 训练数据，增加哑变量
-        self.__y = np.array(trainLabel)  # 训练样本
-        self.__weights = np.zeros(self.__x.shape[1], dtype=float)  # 初始化分类器权重
-
-        progress = Progress(
-            "[progress.description]{task.description}",
-            BarColumn(bar_width=None),
-            "[progress.percentage]{task.percentage:>3.0f}%",
-            "•",
-            TimeRemainingColumn(),
-        )  # rich 进度条
-        progress.start()
+        self.__reset(np.shape(trainData)[1], trainLabel)
+        x, y = self.__prepare(trainData, trainLabel)
+        start = time.perf_counter()
 
-        trainTask = progress.add_task(
-            "[cyan]training...", total=self.__iteration)
+        trainTask = progress.bar(
+            "[cyan]training...", total=self.__iteration, columns='percentage')  # 进度条，每轮更新一次
 
         for iter in range(self.__iteration):
-            for i in range(self.__x.shape[0]):
-                h = self.__sigmoid(np.dot(self.__x[i], self.__weights))
-                self.__weights += self.__alpha * \
-                    (self.__y[i] - h) * h * (1 - h) * self.__x[i]  # 更新权重
-                progress.update(trainTask, advance=1 / self.__x.shape[0])
+            self.__epoch(x, y)
+            if self.stats is not None:  # 每轮的平方误差损失，仅在统计时计算
+                h = self.__sigmoid(x @ self.__weights)
+                self.stats.record('LR.loss', float(
+                    np.mean(np.square(y - h)) / 2))
+            trainTask.advance()
+
+        trainTask.close()
+        if self.stats is not None:
+            self.stats.add('LR.train', start)
+            self.stats.count('LR.epochs', self.__iteration)
+            self.stats.count('LR.updates', self.__iteration * x.shape[0])
+        return self
 
-        progress.stop()
+    def partial_fit(self, trainData, trainLabel, classes=None):
+        '''
+        以一个数据批次增量更新
+        ===================
+        在已有权重与优化器状态上对新批次做一轮随机梯度下降，不重新训练
+
+        Arguments
+        ---------
+        - `trainData` 批次数据
+        - `trainLabel` 批次标签
+        - `classes` 全部类别，首次调用且批次中不含两类时必须指定
+
+        Returns
+        -------
+        - `self`
+
+        Notes
+        -----
+        - 首次调用时确定类别，之后的批次中不能出现其他类别
+        '''
+        if self.__weights is None:
+            if np.unique(trainLabel if classes is None else classes).size < 2:
+                raise ValueError(
+                    'classes must be given when the first batch does not contain two classes')
+            self.__reset(np.shape(trainData)[1],
+                         trainLabel if classes is None else classes)
+        elif classes is not None and not np.array_equal(np.unique(classes), self.classes):
+            raise ValueError('classes {} differ from the classes {} of earlier batches'.format(
+                np.unique(classes), self.classes))
+        unknown = np.setdiff1d(trainLabel, self.classes)
+        if unknown.size > 0:
+            raise ValueError('labels {} are not in classes {}'.format(
+                unknown, self.classes))
+        x, y = self.__prepare(trainData, trainLabel)
+        start = time.perf_counter()
+        self.__epoch(x, y)
+        if self.stats is not None:
+            self.stats.add('LR.partialFit', start)
+            self.stats.count('LR.updates', x.shape[0])
+        return self
+
+    def fit(self, trainData, trainLabel):
+        '''
+        训练，同 `train`
+        '''
+        return self.train(trainData, trainLabel)
+
+    def decision_function(self, testData):
+        '''
+        批量计算正类概率
+        =============
+        Arguments
+        ---------
+        - `testData` 测试数据集
+
+        Returns
+        -------
+        - 各测试样本属于正类的概率
+        '''
+        start = time.perf_counter()
+        testData = np.atleast_2d(np.asarray(testData, dtype=self.dtype))
+        h = self.__sigmoid(testData @ self.__weights[1:] + self.__weights[0])
+        if self.stats is not None:
+            self.stats.add('LR.predict', start)
+            self.stats.count('LR.predicted', testData.shape[0])
+        return h
+
+    def predictFromDecision(self, decision):
+        '''
+        由正类概率得到类别
+        ===============
+        Arguments
+        ---------
+        - `decision` `decision_function` 的结果
+
+        Returns
+        -------
+        - 预测标签，正类概率不小于 0.5 时为正类
+        '''
+        index = (decision >= 0.5).astype(int)
+        return self.classes[np.minimum(index, self.classes.size - 1)]
 
     def classify(self, testDatum):
         '''
@@ -107,9 +288,24 @@ class LogisticRegressionClassifier:
         -------
         - 分类决策函数值
         '''
-        h = self.__sigmoid(
-            np.dot(self.__weights, np.insert(testDatum, 0, values=1.0)))
-        return 1 if h >= 0.5 else 0  # 二分类
+        return self.predict([testDatum])[0]  # 二分类
+
+    def getParams(self):
+        return {'iteration': self.__iteration, 'learning_rate': self.__alpha,
+                'dtype': self.dtype.name, 'schedule': self.__schedule, 'decay': self.__decay,
+                'beta1': self.__beta1, 'beta2': self.__beta2}
+
+    def getState(self):
+        return {'weights': self.__weights, 'classes': self.classes, 'steps': np.array(self.__steps),
+                'moment': self.__moment, 'accumulator': self.__accumulator}
+
+    def setState(self, state):
+        self.__weights, self.classes = state['weights'], state['classes']
+        self.__steps = int(state['steps']) if 'steps' in state else 0
+        self.__moment = state['moment'] if 'moment' in state else np.zeros_like(
+            self.__weights)
+        self.__accumulator = state['accumulator'] if 'accumulator' in state else np.zeros_like(
+            self.__weights)
 
 
 def predict(trainData, trainLabel, testData, iteration=200, learning_rate=0.0001):
@@ -132,21 +328,15 @@ def predict(trainData, trainLabel, testData, iteration=200, learning_rate=0.0001
     classifier = LogisticRegressionClassifier(iteration, learning_rate)
     classifier.train(trainData, trainLabel)
 
-    progress = Progress(
-        "[progress.description]{task.description}",
-        BarColumn(bar_width=None),
-        "[progress.percentage]{task.completed}/{task.total}",
-        "•",
-        TimeRemainingColumn(),
-    )  # rich 进度条
-    progress.start()
-
-    testTask = progress.add_task(
-        "[cyan]predicting...", total=len(testData))
+    testTask = progress.bar(
+        "[cyan]predicting...", total=len(testData))  # 进度条
 
-    for testDatum in testData:
-        predictLabel.append(classifier.classify(testDatum))  # 预测标签分类
-        progress.update(testTask, advance=1)
+    testData = np.asarray(testData, dtype=float)
+    blockSize = 1024
+    for start in range(0, testData.shape[0], blockSize):
+        block = testData[start:start + blockSize]
+        predictLabel.extend(classifier.predict(block))  # 预测标签分类
+        testTask.advance(block.shape[0])
 
-    progress.stop()
+    testTask.close()
     return predictLabel
@@ -6,7 +6,7 @@ Provides
 --------
 - 支持向量机类::
 
-    >>> svm = SupportVectorMachine(kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2)
+    >>> svm = SupportVectorMachine(kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2, dtype='float64')
 
 - 在训练集`trainData`及训练集标签`trainLabel`上训练模型::
 
@@ -16,33 +16,322 @@ Provides
 
     >>> svm.classify(testDatum)
 
+- 批量预测测试数据集`testData`的分类标签::
+
+    >>> svm.predict(testData)
+
+- 多分类，分解为一对其余(`'ovr'`)或一对一(`'ovo'`)的二分类子问题，在进程池中并行求解，共用一张核函数表::
+
+    >>> svm = SupportVectorMachine(kernel='Gaussian', strategy='ovo', jobs=4)
+    >>> svm.fit(trainData, gradeBand).predict(testData)
+
+- 高斯核的近似模式，以随机傅里叶特征或 Nyström 近似映射数据后训练线性模型，无需核函数表::
+
+    >>> svm = SupportVectorMachine(kernel='Gaussian', sigma=10, approximation='fourier', components=500)
+
 - 使用训练集`trainData`及训练集标签`trainLabel`，预测测试数据集`testData`的分类标签::
 
     >>> predict(trainData, trainLabel, testData, kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2)
 
 '''
 
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
 import numpy as np
-from rich.progress import (
-    BarColumn,
-    TimeRemainingColumn,
-    Progress,
-    TaskID,
-)  # 进度条
 
+import features
+import progress  # 进度条
+from estimator import Estimator, register
+
+NEWTON_TOLERANCE = 1e-6  # 近似模式的停止条件：梯度范数相对初始值的比例
+NEWTON_ITERATIONS = 50  # 近似模式的最大牛顿迭代次数
+
+
+def finiteNewton(Z, y, C, stats=None):
+    '''
+    线性支持向量机（平方合页损失）的有限牛顿法
+    ===================================
+    Arguments
+    ---------
+    - `Z` 数据矩阵，每行为一个（映射后的）样本，末列为常数 1 以学习偏置
+    - `y` 标签 +1 / -1
+    - `C` 软间隔惩罚参数
+    - `stats` 统计对象，为 `None` 时不记录
+
+    Algorithm
+    ---------
+    - Modified finite Newton method (Keerthi & DeCoste, 2005)，每次迭代只涉及间隔小于 1 的样本，
+      全部为矩阵运算，通常十余次迭代即收敛
+
+    Formula
+    -------
+        f(w) = 1/2 ||w||^2 + C Sum max(0, 1 - y_i w^T z_i)^2
+        g = w - 2C Z_I^T (y_I - Z_I w)，H = I + 2C Z_I^T Z_I，I 为间隔小于 1 的样本
+
+    Returns
+    -------
+    - 权重 `w`
+    '''
+    def objective(w):
+        return 0.5 * np.dot(w, w) + C * np.sum(np.square(np.maximum(0, 1 - y * (Z @ w))))
+
+    w = np.zeros(Z.shape[1], dtype=Z.dtype)
+    initialNorm = None
+    iterateTask = progress.bar(
+        "[yellow]Newton iterating...", total=NEWTON_ITERATIONS, elapsed=True)
+    for iteration in range(1, NEWTON_ITERATIONS + 1):
+        active = y * (Z @ w) < 1  # 间隔小于 1 的样本
+        Za, ya = Z[active], y[active]
+        gradient = w - 2 * C * (Za.T @ (ya - Za @ w))
+        norm = np.linalg.norm(gradient)
+        initialNorm = norm if initialNorm is None else initialNorm
+        if norm <= NEWTON_TOLERANCE * initialNorm:
+            break
+        hessian = np.eye(Z.shape[1]) + 2 * C * (Za.T @ Za).astype(np.float64)
+        direction = np.linalg.solve(
+            hessian, gradient.astype(np.float64)).astype(Z.dtype)  # 牛顿方向
+
+        step, value = 1.0, objective(w)  # 回溯线搜索
+        while objective(w - step * direction) > value - 0.5 * step * np.dot(gradient, direction) and step > 1e-10:
+            step /= 2
+        w = w - step * direction
+        iterateTask.advance()
+    iterateTask.close()
+
+    if stats is not None:
+        stats.count('SVM.newtonIterations', iteration)
+        stats.count('SVM.supportVectors', int(
+            np.count_nonzero(y * (Z @ w) < 1)))
+    return w
+
+
+def satisfyKKT(K, y, alpha, b, i, C, epsilon):
+    '''
+    判断训练样本点(x_i, y_i)是否违反 KKT 条件
+    ====================================
+    Arguments
+    ---------
+    - `K` 核函数表
+    - `y` 标签 +1 / -1
+    - `alpha` 拉格朗日乘子
+    - `b` 偏置
+    - `i` 样本下标
+    - `C` 软间隔惩罚参数
+    - `epsilon` 松弛变量
+
+    Returns
+    -------
+    训练样本点(x_i, y_i)是否符合 KKT 条件
+    '''
+    z = y[i] * (np.dot(K[i], alpha * y) + b)  # y_i * g(x_i)
+
+    if ((-epsilon < alpha[i] < epsilon) and (z >= 1 - epsilon)) or \
+        ((C - epsilon < alpha[i] < C + epsilon) and (z <= 1 + epsilon)) or \
+            ((-epsilon < alpha[i] < C + epsilon) and (1 - epsilon <= z <= 1 + epsilon)):
+        return True
+    return False
+
+
+def errors(K, y, alpha, b, i=None):
+    '''
+    计算误差项
+    ========
+    Arguments
+    ---------
+    - `K` 核函数表
+    - `y` 标签 +1 / -1
+    - `alpha` 拉格朗日乘子
+    - `b` 偏置
+    - `i` 样本下标，`None` 表示计算全部样本
+
+    Formula
+    -------
+    - E_i = g(x_i) - y_i
+
+    Returns
+    -------
+    - E_i
+    '''
+    if i is None:
+        return K @ (alpha * y) + b - y
+    return np.dot(K[i], alpha * y) + b - y[i]
+
+
+def sequentialMinimalOptimization(K, y, C, epsilon, description=''):
+    '''
+    在给定的核函数表上求解二分类支持向量机
+    ================================
+    Arguments
+    ---------
+    - `K` 核函数表
+    - `y` 标签 +1 / -1，与 `K` 同类型
+    - `C` 软间隔惩罚参数
+    - `epsilon` 松弛变量
+    - `description` 进度条描述的前缀，用于区分多分类的子问题
+
+    Algorithm
+    ---------
+    - Sequential minimal optimization, SMO
+
+    Returns
+    -------
+    - `alpha` 拉格朗日乘子
+    - `b` 偏置
+    - `info` 迭代轮数、违反 KKT 条件的样本数、变量对更新数与每轮违反 KKT 条件的样本数
+    '''
+    alpha = np.zeros(K.shape[0], dtype=K.dtype)  # 与核函数表同类型，避免矩阵乘法时转换整个核函数表
+    b = 0
+    info = {'passes': 0, 'kktViolations': 0,
+            'pairUpdates': 0, 'kktViolationsPerPass': []}
+
+    allSatisfied = False  # 全部满足 KKT 条件
+    iteration = 1  # 迭代次数
+    while not allSatisfied:
+        allSatisfied = True
+        violations = updates = 0  # 本轮违反 KKT 条件的样本数与实际更新的变量对数
+        iterateTask = progress.bar(
+            "[yellow]{}{} iterating...".format(description, iteration), total=K.shape[0], elapsed=True)  # 进度条，限制刷新率
+        iteration += 1
+        for i in range(K.shape[0]):  # 外层循环
+            iterateTask.advance()
+            if not (satisfyKKT(K, y, alpha, b, i, C, epsilon)):  # 选择第一个变量
+                violations += 1
+                E1 = errors(K, y, alpha, b, i)
+                Errors = errors(K, y, alpha, b)
+                j = int(np.argmax(np.fabs(E1 - Errors)))  # 选择第二个变量
+                E2 = Errors[j]
+
+                U = max(0, (alpha[i] + alpha[j] - C) if y[i]
+                        == y[j] else (alpha[j] - alpha[i]))  # alpha^2_new 的下界
+                V = min(C, (alpha[i] + alpha[j]) if y[i]
+                        == y[j] else (alpha[j] - alpha[i] + C))  # alpha^new_2 的上界
+                alpha_2_new = alpha[j] + y[j] * (E1 - E2) / (
+                    K[i, i] + K[j, j] - 2 * K[i, j])
+
+                # alpha^2_new 越界
+                if alpha_2_new > V:
+                    alpha_2_new = V
+                elif alpha_2_new < U:
+                    alpha_2_new = U
+
+                alpha_1_new = alpha[i] + y[i] * \
+                    y[j] * (alpha[j] - alpha_2_new)
+
+                # 更新偏置
+                b_1_new = -E1 - y[i] * K[i, i] * (
+                    alpha_1_new - alpha[i]) - y[j] * K[j, i] * (alpha_2_new - alpha[j]) + b
+                b_2_new = -E2 - y[i] * K[i, j] * (
+                    alpha_1_new - alpha[i]) - y[j] * K[j, j] * (alpha_2_new - alpha[j]) + b
+
+                # 实装更新
+                if (np.fabs(alpha[i] - alpha_1_new) < 0.0000001) and (np.fabs(alpha[j] - alpha_2_new) < 0.0000001):
+                    continue
+                else:
+                    allSatisfied = False
+
+                alpha[i] = alpha_1_new
+                alpha[j] = alpha_2_new
+                updates += 1
+
+                if 0 < alpha_1_new < C:
+                    b = b_1_new
+                elif 0 < alpha_2_new < C:
+                    b = b_2_new
+                else:
+                    b = (b_1_new + b_2_new) / 2
+
+        iterateTask.close()
+        info['passes'] += 1
+        info['kktViolations'] += violations
+        info['pairUpdates'] += updates
+        info['kktViolationsPerPass'].append(violations)
+
+    return alpha, float(b), info
+
+
+def solveShared(name, shape, dtype, index, y, C, epsilon):
+    '''
+    在进程池中求解一个子问题
+    ====================
+    通过共享内存访问父进程计算的完整核函数表，各子问题共用，不重复计算
+
+    Arguments
+    ---------
+    - `name` 共享内存名称
+    - `shape` 核函数表的形状
+    - `dtype` 核函数表的类型
+    - `index` 子问题的样本下标，`None` 表示全部样本
+    - `y` 子问题的标签 +1 / -1
+    - `C` 软间隔惩罚参数
+    - `epsilon` 松弛变量
+
+    Returns
+    -------
+    - 同 `sequentialMinimalOptimization`
+    '''
+    memory = shared_memory.SharedMemory(name=name)
+    K = np.ndarray(shape, dtype=dtype, buffer=memory.buf)
+    try:
+        if index is not None:
+            K = K[np.ix_(index, index)]  # 子问题的核函数表（副本）
+        return sequentialMinimalOptimization(K, y, C, epsilon)
+    finally:
+        del K  # 释放对共享内存的引用后才能关闭
+        memory.close()
+
+
+def subproblems(label, classes, strategy):
+    '''
+    多分类的二分类子问题
+    =================
+    Arguments
+    ---------
+    - `label` 训练集标签
+    - `classes` 排序后的类别
+    - `strategy` `'ovr'` 一对其余，`'ovo'` 一对一
 
-class SupportVectorMachine:
+    Returns
+    -------
+    - `(正类, 负类, 样本下标, 标签 +1 / -1)` 的列表，下标为 `None` 表示全部样本；
+      二分类时只有一个子问题，较大的标签为正类
+    '''
+    label = np.asarray(label)
+    if classes.size <= 2:
+        return [(classes[-1], classes[0], None, np.where(label == classes[-1], 1.0, -1.0))]
+    if strategy == 'ovr':
+        return [(c, None, None, np.where(label == c, 1.0, -1.0)) for c in classes]
+    problems = []
+    for a in range(classes.size):
+        for b in range(a + 1, classes.size):
+            index = np.flatnonzero(
+                (label == classes[a]) | (label == classes[b]))
+            problems.append((classes[b], classes[a], index,
+                             np.where(label[index] == classes[b], 1.0, -1.0)))  # 较大的标签为正类
+    return problems
+
+
+@register('SVM')
+class SupportVectorMachine(Estimator):
     '''
     支持向量机
     ========
     Methods
     -------
     - `Kernel(j, k)` 计算核函数
-    - `train(trainData, trainLabel)` 训练模型
+    - `train(trainData, trainLabel)` 训练模型，同 `fit`
     - `classify(testDatum)` 预测类别
+    - `decision_function(testData)` 批量计算分类决策函数值
+    - `predict(testData)` 批量预测类别
     '''
 
-    def __init__(self, kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2):
+    normalize = True
+    methods = 'SupportVectorMachine'
+
+    def __init__(self, kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2, dtype='float64',
+                 approximation=None, components=500, seed=None, strategy='ovr', jobs=None):
         '''
         类构造函数
         ========
@@ -53,19 +342,37 @@ class SupportVectorMachine:
         - `epsilon` 松弛变量
         - `sigma` 高斯核参数
         - `p` 多项式核参数
+        - `dtype` 浮点类型，`'float64'` 或 `'float32'`，`'float32'` 时核函数表的内存减半
+        - `approximation` 高斯核的近似方法，`None` 为精确的 SMO，`'fourier'` 为随机傅里叶特征，
+          `'nystroem'` 为 Nyström 近似
+        - `components` 近似的特征维数（基准点数目）
+        - `seed` 近似的随机数种子
+        - `strategy` 多分类的分解方式，`'ovr'` 一对其余，`'ovo'` 一对一
+        - `jobs` 并行求解子问题的进程数，`None` 为 CPU 核数，1 为串行
         '''
 
+        self.__kernel = kernel
         self.__C = C
         self.__epsilon = epsilon
+        self.__sigma = sigma
+        self.__p = p
+        self.dtype = np.dtype(dtype)
+        self.__approximation = approximation
+        self.__components = components
+        self.__seed = seed
+        self.__strategy = strategy
+        self.__jobs = jobs
+        if strategy not in ('ovr', 'ovo'):
+            raise ValueError('unknown strategy ' + str(strategy))
+        if approximation is not None and kernel != 'Gaussian':
+            raise ValueError('approximation requires the Gaussian kernel')
 
         if kernel == 'Gaussian':
             self.Kernel = self.__GaussianKernel
-            self.__sigma = sigma
         elif kernel == 'Linear':
             self.Kernel = self.__LinearKernel
         elif kernel == 'Polynomial':
             self.Kernel = self.__PolynomialKernel
-            self.__p = p
 
     def Kernel(self, j, k):
         '''
@@ -73,12 +380,12 @@ class SupportVectorMachine:
         =====
         Arguments
         ---------
-        - `j` 数据点 $x_j$
-        - `k` 数据点 $x_k$
+        - `j` 数据点 $x_j$，或每行为一个数据点的矩阵
+        - `k` 数据点 $x_k$，或每行为一个数据点的矩阵
 
         Returns
         -------
-        - 核函数值
+        - 核函数值，输入为矩阵时为核函数矩阵
         '''
         # return self.__LinearKernel(j, k)
         return self.__GaussianKernel(j, k)
@@ -101,7 +408,7 @@ class SupportVectorMachine:
         - 核函数值
         '''
 
-        return np.dot(j, k)
+        return np.dot(j, np.transpose(k))
 
     def __GaussianKernel(self, j, k, sigma=None):
         '''
@@ -125,7 +432,13 @@ class SupportVectorMachine:
         if sigma == None:
             sigma = self.__sigma
 
-        return np.exp(-np.sum(np.square(j - k)) / (2 * sigma**2))
+        J = np.atleast_2d(np.asarray(j, dtype=self.dtype))
+        K = np.atleast_2d(np.asarray(k, dtype=self.dtype))
+        squared = np.sum(np.square(J), axis=1)[:, np.newaxis] + \
+            np.sum(np.square(K), axis=1)[np.newaxis, :] - \
+            2 * J @ K.T  # ||x_j||^2 + ||x_k||^2 - 2 x_j x_k
+        value = np.exp(-np.maximum(squared, 0) / (2 * sigma**2))
+        return value.reshape(np.shape(j)[:-1] + np.shape(k)[:-1])  # 与内积的形状一致
 
     def __PolynomialKernel(self, j, k, p=None):
         '''
@@ -149,159 +462,207 @@ class SupportVectorMachine:
         if p == None:
             p = self.__p
 
-        return np.power(np.dot(j, k) + 1, p)
+        return np.power(np.dot(j, np.transpose(k)) + 1, p)
 
-    def __ifSatisfyKKT(self, i, C=None, epsilon=None):
+    def train(self, trainData, trainLabel):
         '''
-        判断训练样本点(x_i, y_i)是否违反 KKT 条件
-        ====================================
+        训练
+        ===
         Arguments
         ---------
-        - `x`
-        - `y`
-        - `i`
-        - `C`
-        - `epsilon` 松弛变量
+        - `trainData` 训练集数据
+        - `trainLabel` 训练集标签，多于两类时按 `strategy` 分解为二分类子问题
+
+        Algorithm
+        ---------
+        - Sequential minimal optimization, SMO，见 `sequentialMinimalOptimization`
+        - 近似模式下为映射空间中的有限牛顿法，见 `finiteNewton`
 
         Returns
         -------
-        训练样本点(x_i, y_i)是否符合 KKT 条件
         '''
-        if C == None:
-            C = self.__C
-        if epsilon == None:
-            epsilon = self.__epsilon
-
-        z = self.__y[i] * (np.sum([self.__alpha[j] * self.__y[j] * self.__K[i, j]
-                                   for j in range(self.__alpha.size)]) + self.__b)  # y_i * g(x_i)
+        self.__x = np.array(trainData, dtype=self.dtype)
+        self.classes = np.unique(trainLabel)
+        problems = subproblems(trainLabel, self.classes, self.__strategy)
+        self.__pairs = np.array([[np.searchsorted(self.classes, positive),
+                                  -1 if negative is None else np.searchsorted(self.classes, negative)]
+                                 for positive, negative, _, _ in problems])  # 各子问题的正类与负类下标
+        if self.stats is not None:
+            self.stats.count('SVM.subproblems', len(problems))
+        if self.__approximation is not None:
+            return self.__trainApproximate(problems)
+
+        start = time.perf_counter()
+        K = self.Kernel(self.__x, self.__x)  # 计算核函数表，各子问题共用
+        if self.stats is not None:
+            self.stats.add('SVM.gram', start)
+        start = time.perf_counter()
+        results = self.__solve(K, problems)
+        del K  # 核函数表仅训练时使用
+
+        coefficients = np.zeros(
+            [self.__x.shape[0], len(problems)], dtype=self.dtype)
+        for p, ((_, _, index, y), (alpha, _, info)) in enumerate(zip(problems, results)):
+            coefficients[slice(None) if index is None else index, p] = alpha * y
+            if self.stats is not None:
+                self.stats.count('SVM.passes', info['passes'])
+                self.stats.count('SVM.kktViolations', info['kktViolations'])
+                self.stats.count('SVM.pairUpdates', info['pairUpdates'])
+                for violations in info['kktViolationsPerPass']:
+                    self.stats.record('SVM.kktViolationsPerPass', violations)
+
+        support = np.any(coefficients != 0, axis=1)  # 任一子问题的支持向量 alpha > 0
+        self.__supportVectors = self.__x[support]
+        self.__coefficients = coefficients[support]
+        self.__b = np.array([b for _, b, _ in results], dtype=self.dtype)
+        if self.stats is not None:
+            self.stats.add('SVM.smo', start)
+            self.stats.count('SVM.supportVectors', int(np.count_nonzero(support)))
+        del self.__x
+
+        return self
+
+    def __solve(self, K, problems):
+        '''
+        求解各二分类子问题
+        ===============
+        子问题多于一个且 `jobs` 不为 1 时，将核函数表放入共享内存，由进程池并行求解，
+        父进程在各子问题完成时更新进度条
 
-        if ((-epsilon < self.__alpha[i] < epsilon) and (z >= 1 - epsilon)) or \
-            ((C - epsilon < self.__alpha[i] < C + epsilon) and (z <= 1 + epsilon)) or \
-                ((-epsilon < self.__alpha[i] < C + epsilon) and (1 - epsilon <= z <= 1 + epsilon)):
-            return True
-        return False
+        Returns
+        -------
+        - 各子问题的 `(alpha, b, info)`，见 `sequentialMinimalOptimization`
+        '''
+        jobs = min(self.__jobs or os.cpu_count() or 1, len(problems))
+        if jobs == 1:
+            return [sequentialMinimalOptimization(
+                K if index is None else K[np.ix_(index, index)], y.astype(self.dtype), self.__C, self.__epsilon,
+                description='' if len(problems) == 1 else '[{}/{}] '.format(p + 1, len(problems)))
+                for p, (_, _, index, y) in enumerate(problems)]
+
+        memory = shared_memory.SharedMemory(create=True, size=K.nbytes)
+        shared = np.ndarray(K.shape, dtype=K.dtype, buffer=memory.buf)
+        try:
+            shared[...] = K
+            solveTask = progress.bar(
+                "[yellow]solving subproblems...", total=len(problems), elapsed=True)
+            with ProcessPoolExecutor(max_workers=jobs, initializer=progress.configure,
+                                     initargs=(True,)) as pool:  # 子进程不显示进度条
+                futures = [pool.submit(solveShared, memory.name, K.shape, K.dtype.str, index,
+                                       y.astype(self.dtype), self.__C, self.__epsilon)
+                           for _, _, index, y in problems]
+                for _ in as_completed(futures):
+                    solveTask.advance()
+                results = [future.result() for future in futures]
+            solveTask.close()
+        finally:
+            del shared
+            memory.close()
+            memory.unlink()
+        return results
+
+    def __trainApproximate(self, problems):
+        '''
+        近似模式的训练
+        ============
+        将数据映射到 `components` 维后，以有限牛顿法训练（平方合页损失的）线性支持向量机，
+        内存为 O(n * components)，不计算核函数表；各子问题共用映射后的数据
+        '''
+        start = time.perf_counter()
+        self.__features = features.create(self.__approximation, components=self.__components,
+                                          sigma=self.__sigma, seed=self.__seed, dtype=self.dtype)
+        Z = self.__features.fit(self.__x).transform(self.__x)
+        Z = np.hstack((Z, np.ones((Z.shape[0], 1), dtype=self.dtype)))  # 常数特征，学习偏置
+        if self.stats is not None:
+            self.stats.add('SVM.features', start)
+        start = time.perf_counter()
+        W = np.stack([finiteNewton(Z if index is None else Z[index], y.astype(self.dtype),
+                                   self.__C, self.stats) for _, _, index, y in problems], axis=1)
+        if self.stats is not None:
+            self.stats.add('SVM.newton', start)
+        self.__weights, self.__b = W[:-1], W[-1]
+        del self.__x
+        return self
+
+    def fit(self, trainData, trainLabel):
+        '''
+        训练，同 `train`
+        '''
+        return self.train(trainData, trainLabel)
 
-    def __Error(self, i):
+    def __subproblemDecision(self, testData):
         '''
-        计算误差项
-        ========
-        Arguments
-        ---------
-        - `i`
+        批量计算各子问题的分类决策函数值
+        ===========================
+        各子问题的支持向量合并后只计算一次核函数矩阵
 
         Formula
         -------
-        - E_i = g(x_i) - y_i
+            g(x) = Sum alpha_i y_i K(x, x_i) + b，仅对支持向量求和
+            g(x) = w^T z(x) + b，近似模式
 
         Returns
         -------
-        - E_i
+        - 第 i 行第 p 列为测试样本 i 在子问题 p 上的分类决策函数值
         '''
-
-        return np.sum([self.__alpha[j] * self.__y[j] * self.__K[i, j]
-                       for j in range(self.__alpha.size)]) + self.__b - self.__y[i]
-
-    def train(self, trainData, trainLabel):
+        start = time.perf_counter()
+        testData = np.atleast_2d(np.asarray(testData, dtype=self.dtype))
+        if self.__approximation is not None:
+            distance = self.__features.transform(
+                testData) @ self.__weights + self.__b
+        elif self.__supportVectors.shape[0] == 0:
+            distance = np.broadcast_to(
+                self.__b, (testData.shape[0], self.__b.size))
+        else:
+            distance = self.Kernel(
+                testData, self.__supportVectors) @ self.__coefficients + self.__b
+        if self.stats is not None:
+            self.stats.add('SVM.classify', start)
+            self.stats.count('SVM.classified', testData.shape[0])
+        return distance
+
+    def decision_function(self, testData):
         '''
-        训练
-        ===
+        批量计算分类决策函数值
+        ==================
         Arguments
         ---------
-        - `trainData` 训练集数据
-        - `trainLabel` 训练集标签
+        - `testData` 测试数据集
 
-        Algorithm
+        Returns
+        -------
+        - 二分类时为各测试样本的分类决策函数值
+        - 多分类时为矩阵，第 i 行第 c 列为测试样本 i 对类别 `classes[c]` 的得分：
+          一对其余为该类子问题的决策函数值，一对一为该类得到的票数
+        '''
+        distance = self.__subproblemDecision(testData)
+        if self.__pairs.shape[0] == 1:
+            return distance[:, 0]
+        if self.__pairs[0, 1] < 0:  # 一对其余
+            return distance
+        votes = np.zeros(
+            [distance.shape[0], self.classes.size], dtype=np.int64)
+        for p, (positive, negative) in enumerate(self.__pairs):
+            votes[:, positive] += distance[:, p] > 0
+            votes[:, negative] += distance[:, p] <= 0
+        return votes
+
+    def predictFromDecision(self, decision):
+        '''
+        由分类决策函数值得到类别
+        ====================
+        Arguments
         ---------
-        - Sequential minimal optimization, SMO
+        - `decision` `decision_function` 的结果
 
         Returns
         -------
+        - 预测标签，二分类时分类决策函数值大于 0 为正类，多分类时为得分最高的类别（相同时取较小的标签）
         '''
-        self.__x, self.__y = np.array(trainData), np.array(trainLabel)
-        self.__alpha = np.zeros(self.__x.shape[0])
-        self.__b = 0
-        self.__K = np.zeros(
-            [self.__x.shape[0], self.__x.shape[0]], dtype=float)  # 训练数据核函数表
-
-        for i in range(self.__x.shape[0]):
-            for j in range(i, self.__x.shape[0]):
-                self.__K[i, j] = self.__K[j, i] = self.Kernel(
-                    self.__x[i], self.__x[j])  # 计算核函数表
-
-        progress = Progress(
-            "[progress.description]{task.description}",
-            BarColumn(bar_width=None),
-            "[progress.percentage]{task.completed}/{task.total}",
-            "•",
-            "[time]{task.elapsed:.2f}s",
-        )  # rich 进度条
-        progress.start()
-
-        allSatisfied = False  # 全部满足 KKT 条件
-        iteration = 1  # 迭代次数
-        while not allSatisfied:
-            allSatisfied = True
-            iterateTask = progress.add_task(
-                "[yellow]{} iterating...".format(iteration), total=self.__x.shape[0])
-            iteration += 1
-            for i in range(self.__x.shape[0]):  # 外层循环
-                progress.update(iterateTask, advance=1)
-                if not (self.__ifSatisfyKKT(i)):  # 选择第一个变量
-                    E1 = self.__Error(i)
-                    maximum = -1
-                    for k in range(self.__x.shape[0]):  # 内层循环
-                        tempE = self.__Error(k)
-                        tempE_difference = np.fabs(E1 - self.__Error(k))
-                        if tempE_difference > maximum:  # 选择第二个变量
-                            maximum = tempE_difference
-                            E2 = tempE
-                            j = k
-                    if maximum == -1:
-                        continue
-
-                    U = max(0, (self.__alpha[i] + self.__alpha[j] - self.__C) if self.__y[i]
-                            == self.__y[j] else (self.__alpha[j] - self.__alpha[i]))  # alpha^2_new 的下界
-                    V = min(self.__C, (self.__alpha[i] + self.__alpha[j]) if self.__y[i]
-                            == self.__y[j] else (self.__alpha[j] - self.__alpha[i] + self.__C))  # alpha^new_2 的上界
-                    alpha_2_new = self.__alpha[j] + self.__y[j] * (E1 - E2) / (
-                        self.__K[i, i] + self.__K[j, j] - 2 * self.__K[i, j])
-
-                    # alpha^2_new 越界
-                    if alpha_2_new > V:
-                        alpha_2_new = V
-                    elif alpha_2_new < U:
-                        alpha_2_new = U
-
-                    alpha_1_new = self.__alpha[i] + self.__y[i] * \
-                        self.__y[j] * (self.__alpha[j] - alpha_2_new)
-
-                    # 更新偏置
-                    b_1_new = -E1 - self.__y[i] * self.__K[i, i] * (
-                        alpha_1_new - self.__alpha[i]) - self.__y[j] * self.__K[j, i] * (alpha_2_new - self.__alpha[j]) + self.__b
-                    b_2_new = -E2 - self.__y[i] * self.__K[i, j] * (
-                        alpha_1_new - self.__alpha[i]) - self.__y[j] * self.__K[j, j] * (alpha_2_new - self.__alpha[j]) + self.__b
-
-                    # 实装更新
-                    if (np.fabs(self.__alpha[i] - alpha_1_new) < 0.0000001) and (np.fabs(self.__alpha[j] - alpha_2_new) < 0.0000001):
-                        continue
-                    else:
-                        allSatisfied = False
-
-                    self.__alpha[i] = alpha_1_new
-                    self.__alpha[j] = alpha_2_new
-
-                    if 0 < alpha_1_new < self.__C:
-                        self.__b = b_1_new
-                    elif 0 < alpha_2_new < self.__C:
-                        self.__b = b_2_new
-                    else:
-                        self.__b = (b_1_new + b_2_new) / 2
-
-            progress.stop_task(iterateTask)
-
-        progress.stop()
-
-        return
+        if decision.ndim == 2:
+            return self.classes[np.argmax(decision, axis=1)]
+        index = (decision > 0).astype(int)
+        return self.classes[np.minimum(index, self.classes.size - 1)]
 
     def classify(self, testDatum):
         '''
@@ -313,11 +674,40 @@ class SupportVectorMachine:
 
         Returns
         -------
-        - 分类决策函数值
+        - 二分类时为分类决策函数值的符号，多分类时为预测标签
         '''
-        distance = np.sum([self.__alpha[i] * self.__y[i] * self.Kernel(testDatum, self.__x[i])
-                           for i in range(self.__x.shape[0]) if self.__alpha[i] > 0]) + self.__b  # 支持向量 alpha > 0
-        return np.sign(distance)
+        if self.__pairs.shape[0] > 1:
+            return self.predict([testDatum])[0]
+        return np.sign(self.decision_function([testDatum])[0])
+
+    def getParams(self):
+        return {'kernel': self.__kernel, 'C': self.__C, 'epsilon': self.__epsilon,
+                'sigma': self.__sigma, 'p': self.__p, 'dtype': self.dtype.name,
+                'approximation': self.__approximation, 'components': self.__components,
+                'seed': self.__seed, 'strategy': self.__strategy, 'jobs': self.__jobs}
+
+    def getState(self):
+        state = {'b': self.__b, 'classes': self.classes, 'pairs': self.__pairs}
+        if self.__approximation is not None:
+            return {'weights': self.__weights, **state,
+                    **{'features_' + key: value for key, value in self.__features.getState().items()}}
+        return {'supportVectors': self.__supportVectors, 'coefficients': self.__coefficients, **state}
+
+    def setState(self, state):
+        self.classes = state['classes']
+        self.__b = np.atleast_1d(state['b'])
+        self.__pairs = state['pairs'] if 'pairs' in state else np.array(
+            [[self.classes.size - 1, 0]])  # 早期保存的二分类模型
+        if self.__approximation is not None:
+            self.__features = features.create(self.__approximation, components=self.__components,
+                                              sigma=self.__sigma, seed=self.__seed, dtype=self.dtype)
+            self.__features.setState({key[len('features_'):]: value for key, value in state.items()
+                                      if key.startswith('features_')})
+            self.__weights = state['weights'].reshape(-1, self.__b.size)
+        else:
+            self.__supportVectors = state['supportVectors']
+            self.__coefficients = state['coefficients'].reshape(
+                -1, self.__b.size)
 
 
 def predict(trainData, trainLabel, testData, kernel='Gaussian', C=200, epsilon=0.0001, sigma=10, p=2):
@@ -341,24 +731,18 @@ def predict(trainData, trainLabel, testData, kernel='Gaussian', C=200, epsilon=0
     '''
     predictLabel = []
     machine = SupportVectorMachine(
-        kernel=kernel, C=C, epsilon=epsilon, sigma=sigma)
+        kernel=kernel, C=C, epsilon=epsilon, sigma=sigma, p=p)
     machine.train(trainData, trainLabel)
 
-    progress = Progress(
-        "[progress.description]{task.description}",
-        BarColumn(bar_width=None),
-        "[progress.percentage]{task.completed}/{task.total}",
-        "•",
-        TimeRemainingColumn(),
-    )  # rich 进度条
-    progress.start()
-
-    testTask = progress.add_task(
-        "[cyan]predicting...", total=len(testData))
+    testTask = progress.bar(
+        "[cyan]predicting...", total=len(testData))  # 进度条
 
-    for testDatum in testData:
-        predictLabel.append(machine.classify(testDatum))  # 预测标签分类
-        progress.update(testTask, advance=1)
+    testData = np.asarray(testData, dtype=float)
+    blockSize = 1024
+    for start in range(0, testData.shape[0], blockSize):
+        block = testData[start:start + blockSize]
+        predictLabel.extend(machine.predict(block))  # 预测标签分类
+        testTask.advance(block.shape[0])
 
-    progress.stop()
+    testTask.close()
     return predictLabel
@@ -0,0 +1,195 @@
+'''
+estimator
+===
+    分类器的统一接口与按名称注册的模型表
+Provides
+--------
+- 分类器基类，各学习算法的分类器均实现批量的 `fit`、`predict`、`decision_function`::
+
+    >>> class Classifier(Estimator): ...
+
+- 按名称注册分类器::
+
+    >>> @register('KNN')
+    ... class NearestNeighborsClassifier(Estimator): ...
+
+- 按名称创建分类器，仅导入所需算法的模块::
+
+    >>> model = create('SVM', kernel='Gaussian', C=200)
+
+- 保存与加载已训练的分类器，无需重新训练；训练时使用的预处理流水线（`model.pipeline`）一同保存::
+
+    >>> model.save('svm.npz')
+    >>> model = load('svm.npz')
+
+'''
+
+import importlib
+import json
+
+import numpy as np
+
+MODELS = {}  # 名称 -> 分类器类
+MODULES = {'KNN': 'KNN', 'LR': 'LR', 'SVM': 'SVM'}  # 名称 -> 定义分类器的模块，创建时才导入
+PIPELINE_PREFIX = '__pipeline__.'  # 保存文件中预处理流水线状态的键前缀
+
+
+def register(name):
+    '''
+    注册分类器的类装饰器
+    =================
+    Arguments
+    ---------
+    - `name` 分类器名称
+
+    Returns
+    -------
+    - 类装饰器
+    '''
+    def decorator(cls):
+        cls.name = name
+        MODELS[name] = cls
+        return cls
+    return decorator
+
+
+def create(name, **params):
+    '''
+    按名称创建分类器
+    =============
+    Arguments
+    ---------
+    - `name` 分类器名称
+    - `params` 分类器构造参数
+
+    Returns
+    -------
+    - 未训练的分类器
+    '''
+    if name not in MODELS and name in MODULES:
+        importlib.import_module(MODULES[name])  # 导入时由 `register` 注册
+    if name not in MODELS:
+        raise KeyError('unknown model ' + str(name))
+    return MODELS[name](**params)
+
+
+def load(file):
+    '''
+    加载已训练的分类器
+    ===============
+    Arguments
+    ---------
+    - `file` 由 `Estimator.save` 保存的 `.npz` 文件
+
+    Returns
+    -------
+    - 已训练的分类器
+    '''
+    with np.load(file, allow_pickle=False) as archive:
+        name = str(archive['__name__'])
+        params = json.loads(str(archive['__params__']))
+        state = {key: archive[key]
+                 for key in archive.files if not key.startswith('__')}
+        pipeline = None
+        if '__pipeline__' in archive.files:  # 预处理流水线，之前保存的模型没有
+            import preprocess
+            pipeline = preprocess.Pipeline(
+                **json.loads(str(archive['__pipeline__'])))
+            pipeline.setState({key[len(PIPELINE_PREFIX):]: archive[key]
+                               for key in archive.files if key.startswith(PIPELINE_PREFIX)})
+    model = create(name, **params)
+    model.setState(state)
+    model.pipeline = pipeline
+    return model
+
+
+class Estimator:
+    '''
+    分类器基类
+    ========
+    子类需实现 `fit`、`decision_function`、`predictFromDecision`、`getParams`、`getState` 与 `setState`，
+    输入均为批量的数据矩阵
+
+    Methods
+    -------
+    - `fit(X, y)` 训练模型
+    - `decision_function(X)` 批量计算决策函数值，二分类时为正类得分
+    - `predict(X)` 批量预测类别，即由决策函数值得到的类别
+    - `predictFromDecision(decision)` 由 `decision_function` 的结果得到类别，同时需要得分与类别时无需重复计算
+    - `save(file)` 保存已训练的模型
+
+    Attributes
+    ----------
+    - `stats` 统计对象（见 `common/instrument.py`），为 `None` 时不记录
+    - `pipeline` 拟合好的预处理流水线（见 `preprocess.Pipeline`），随模型保存
+    - `dtype` 训练与推断使用的浮点类型，由构造参数 `dtype` 指定，`'float32'` 时核函数表等中间数组的内存减半
+    '''
+
+    name = None  # 注册名称，由 `register` 设置
+    stats = None  # 分阶段计时与计数，默认不记录
+    pipeline = None  # 预处理流水线
+    dtype = np.dtype(np.float64)  # 浮点类型
+    normalize = False  # 是否使用缩放后的数据，见 `preprocess.Pipeline.forModel`
+    methods = 'NearestNeighbors'  # 数据的标签处理方式，见 `preprocess.Pipeline.forModel`
+
+    def fit(self, X, y):
+        raise NotImplementedError
+
+    def decision_function(self, X):
+        raise NotImplementedError
+
+    def predict(self, X):
+        return self.predictFromDecision(self.decision_function(X))
+
+    def predictFromDecision(self, decision):
+        raise NotImplementedError
+
+    def getParams(self):
+        '''
+        构造参数
+        ======
+        Returns
+        -------
+        - 可 JSON 序列化的构造参数字典
+        '''
+        raise NotImplementedError
+
+    def getState(self):
+        '''
+        训练所得状态
+        ==========
+        Returns
+        -------
+        - 以名称为键的数组字典
+        '''
+        raise NotImplementedError
+
+    def setState(self, state):
+        '''
+        恢复训练所得状态
+        =============
+        Arguments
+        ---------
+        - `state` `getState` 返回的数组字典
+        '''
+        raise NotImplementedError
+
+    def save(self, file):
+        '''
+        保存已训练的模型
+        =============
+        Arguments
+        ---------
+        - `file` `.npz` 文件路径
+
+        Returns
+        -------
+        '''
+        arrays = dict(self.getState())
+        if self.pipeline is not None:
+            arrays['__pipeline__'] = np.array(
+                json.dumps(self.pipeline.getParams()))
+            arrays.update({PIPELINE_PREFIX + key: value
+                           for key, value in self.pipeline.getState().items()})
+        np.savez(file, __name__=np.array(self.name),
+                 __params__=np.array(json.dumps(self.getParams())), **arrays)
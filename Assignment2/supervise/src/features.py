@@ -0,0 +1,178 @@
+'''
+features
+===
+    高斯核函数的低秩特征映射
+Provides
+--------
+- 随机傅里叶特征，映射后的内积近似高斯核函数值::
+
+    >>> fourier = RandomFourierFeatures(components=500, sigma=10, seed=0)
+    >>> Z = fourier.fit(trainData).transform(trainData)
+
+- Nyström 近似，以随机选取的训练样本为基准点::
+
+    >>> nystroem = NystroemFeatures(components=500, sigma=10, seed=0)
+    >>> Z = nystroem.fit(trainData).transform(testData)
+
+- 按名称创建::
+
+    >>> create('fourier', components=500, sigma=10)
+
+Notes
+-----
+- 映射后的维数为 `components`，在映射空间中训练线性模型即可近似核方法，
+  内存为 O(n * components) 而非核函数表的 O(n^2)
+'''
+
+import numpy as np
+
+
+def GaussianKernel(A, B, sigma):
+    '''
+    批量计算高斯核函数
+    ===============
+    Arguments
+    ---------
+    - `A` 数据矩阵，每行为一个数据点
+    - `B` 数据矩阵，每行为一个数据点
+    - `sigma` 高斯核参数
+
+    Returns
+    -------
+    - 核函数矩阵，第 i 行第 j 列为 exp(-||A_i - B_j||^2 / 2 sigma^2)
+    '''
+    squared = np.sum(np.square(A), axis=1)[:, np.newaxis] + \
+        np.sum(np.square(B), axis=1)[np.newaxis, :] - 2 * A @ B.T
+    return np.exp(-np.maximum(squared, 0) / (2 * sigma**2))
+
+
+class RandomFourierFeatures:
+    '''
+    随机傅里叶特征
+    ============
+    Formula
+    -------
+        z(x) = sqrt(2 / D) cos(W^T x + b)，W ~ N(0, I / sigma^2)，b ~ U(0, 2 pi)
+        E[z(x)^T z(y)] = exp(-||x - y||^2 / 2 sigma^2)
+
+    Methods
+    -------
+    - `fit(data)` 采样映射参数，仅使用数据的维数
+    - `transform(data)` 映射数据
+    - `getState()`、`setState(state)` 映射参数
+    '''
+
+    def __init__(self, components=500, sigma=10, seed=None, dtype='float64'):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `components` 映射后的维数
+        - `sigma` 高斯核参数
+        - `seed` 随机数种子
+        - `dtype` 浮点类型
+        '''
+
+        self.components = components
+        self.sigma = sigma
+        self.seed = seed
+        self.dtype = np.dtype(dtype)
+
+    def fit(self, data):
+        rng = np.random.default_rng(self.seed)
+        self.weights = (rng.standard_normal(
+            (np.shape(data)[1], self.components)) / self.sigma).astype(self.dtype)
+        self.offsets = rng.uniform(
+            0, 2 * np.pi, self.components).astype(self.dtype)
+        return self
+
+    def transform(self, data):
+        data = np.atleast_2d(np.asarray(data, dtype=self.dtype))
+        return np.sqrt(np.asarray(2 / self.components, dtype=self.dtype)) * \
+            np.cos(data @ self.weights + self.offsets)
+
+    def getState(self):
+        return {'weights': self.weights, 'offsets': self.offsets}
+
+    def setState(self, state):
+        self.weights, self.offsets = state['weights'], state['offsets']
+
+
+class NystroemFeatures:
+    '''
+    Nyström 近似
+    ===========
+    Formula
+    -------
+        z(x) = K_mm^{-1/2} k(L, x)，L 为随机选取的 m 个训练样本
+        z(x)^T z(y) = k(x, L) K_mm^{-1} k(L, y)
+
+    Methods
+    -------
+    - `fit(data)` 选取基准点并计算 K_mm^{-1/2}
+    - `transform(data)` 映射数据
+    - `getState()`、`setState(state)` 基准点与归一化矩阵
+    '''
+
+    def __init__(self, components=500, sigma=10, seed=None, dtype='float64'):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `components` 基准点数目，不超过训练样本数
+        - `sigma` 高斯核参数
+        - `seed` 随机数种子
+        - `dtype` 浮点类型
+        '''
+
+        self.components = components
+        self.sigma = sigma
+        self.seed = seed
+        self.dtype = np.dtype(dtype)
+
+    def fit(self, data):
+        data = np.asarray(data, dtype=self.dtype)
+        rng = np.random.default_rng(self.seed)
+        index = rng.choice(data.shape[0], min(
+            self.components, data.shape[0]), replace=False)
+        self.landmarks = data[index]  # 基准点
+        eigenValues, eigenVectors = np.linalg.eigh(GaussianKernel(
+            self.landmarks, self.landmarks, self.sigma).astype(np.float64))
+        keep = eigenValues > eigenValues[-1] * 1e-10  # 舍去数值上为零的特征值，即伪逆
+        self.normalization = (eigenVectors[:, keep] / np.sqrt(
+            eigenValues[keep])).astype(self.dtype)  # K_mm^{-1/2} 的低秩形式
+        return self
+
+    def transform(self, data):
+        data = np.atleast_2d(np.asarray(data, dtype=self.dtype))
+        return GaussianKernel(data, self.landmarks, self.sigma) @ self.normalization
+
+    def getState(self):
+        return {'landmarks': self.landmarks, 'normalization': self.normalization}
+
+    def setState(self, state):
+        self.landmarks, self.normalization = state['landmarks'], state['normalization']
+
+
+MAPS = {'fourier': RandomFourierFeatures,
+        'nystroem': NystroemFeatures}  # 名称 -> 特征映射类
+
+
+def create(name, **params):
+    '''
+    按名称创建特征映射
+    ===============
+    Arguments
+    ---------
+    - `name` `'fourier'` 或 `'nystroem'`
+    - `params` 构造参数
+
+    Returns
+    -------
+    - 未拟合的特征映射
+    '''
+    if name not in MAPS:
+        raise ValueError('unknown approximation ' + str(name))
+    return MAPS[name](**params)
@@ -1,73 +1,41 @@
 import argparse
-import csv
+import os
+import sys
 import time
 
 import numpy as np
-from sklearn import preprocessing
 
-import KNN
-import SVM
-import LR
+import estimator
+import metrics
+import preprocess
+import progress
 
+sys.path.append(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', '..', 'common'))
+import instrument  # 分阶段计时与计数
+import store  # 内存映射的数据矩阵
 
-def loadData(file, Normalize=False, Methods='NearestNeighbors'):
+
+def loadData(file, pipeline, fit=False, cache=None):
     '''
     加载数据集
     ========
     Arguments
     ---------
     - `file` 数据集文件
-    - `Normalize` 是否进行标准化
-    - `Methods` 为不同学习方法做处理
-        - `'NearestNeighbors'` k-近邻算法，类别标签为 0-不及格与 1-及格
-        - `'LogisticRegression'` Logistic 回归算法，类别标签为 0-不及格与 1-及格
-        - `'SupportVectorMachine'` 支持向量机算法，类别标签为 -1-不及格与 1-及格
+    - `pipeline` 预处理流水线（见 `preprocess.Pipeline`），在训练数据上拟合，其他数据只做变换
+    - `fit` 是否在该文件上拟合流水线
+    - `cache` 变换结果的缓存目录，`None` 表示不缓存
 
     Returns
     -------
-    - `Data_withG1G2` 包含属性G1 G2的数据集
-    - `Data_withoutG1G2` 不包含属性G1 G2的数据集
-    - `Label` 指示是否及格的标签集
+    - `Data` 包含属性 G1 G2 的特征矩阵
+    - `Label` 指示是否及格（或成绩等级）的标签集
     '''
-    print('start reading ' + file)
-    Attributes = [[] for i in range(30)]  # 转置的属性列表
-    Grades = []
-    Label = []
-    labelEncoder = preprocessing.LabelEncoder()
-    with open(file, 'r') as fileStream:
-        lines = csv.reader(fileStream, delimiter=';')
-        next(lines)  # 跳过表头
-        for line in lines:
-            for i in [0, 1, 3, 4, 5, 8, 9, 10, 11, 15, 16, 17, 18, 19, 20, 21, 22]:  # binary or nominal
-                Attributes[i].append(line[i])
-            for i in [2, 6, 7, 12, 13, 14, 23, 24, 25, 26, 27, 28, 29]:  # numeric
-                Attributes[i].append(int(line[i]))
-            Grades.append([int(num) for num in line[30:32]])  # 31:G1 32:G2
-            # G3 >= 10 为及格
-            Label.append(
-                1 if int(line[-1]) >= 10 else (-1 if Methods == 'SupportVectorMachine' else 0))
-        for i in [0, 1, 3, 4, 5, 8, 9, 10, 11, 15, 16, 17, 18, 19, 20, 21, 22]:
-            Attributes[i] = labelEncoder.fit_transform(Attributes[i])  # 编码为整数
-        Data_withoutG = np.array(Attributes).T  # 转置属性
-
-        if Normalize == True:
-            upperBounds = [1, 1, 22, 1, 1, 1, 4, 4, 4, 4, 3, 2, 4,
-                           4, 3, 1, 1, 1, 1, 1, 1, 1, 1, 5, 5, 5, 5, 5, 5, 93]  # 属性上界
-            lowerBounds = [0, 0, 15, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1,
-                           1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 1, 1, 1, 1, 1, 0]  # 属性下界
-
-            Data_withoutG = Data_withoutG.astype(np.float64)  # 转换为浮点类型
-
-            for i in range(Data_withoutG.shape[0]):
-                for j in range(30):
-                    Data_withoutG[i, j] = (
-                        Data_withoutG[i, j] - lowerBounds[j]) / (upperBounds[j] - lowerBounds[j])
-            Grades = np.array(Grades, dtype=float) / 20
-
-    return list(np.hstack((Data_withoutG, Grades))), Data_withoutG, Label
-
-
-def modelTest(testLabel, predictLabel):
+    return preprocess.transformFile(file, pipeline, fit, cache)
+
+
+def modelTest(testLabel, predictLabel, score=None):
     '''
     测试模型正确率
     ===========
@@ -75,35 +43,22 @@ def modelTest(testLabel, predictLabel):
     ---------
     - `testLabel` 测试集标签
     - `predictLabel` 预测模型预测标签
+    - `score` 预测为正类的得分，可选，用于计算 ROC-AUC
 
     Returns
     -------
-    - 模型正确率
+    - 模型 F1 值，多分类时为宏平均 F1 值
     '''
 
-    truePositive = falsePositive = falseNegative = trueNegative = 0
-    for i in range(len(testLabel)):
-        if predictLabel[i] == 1:
-            if testLabel[i] == 1:
-                truePositive += 1
-            else:
-                falsePositive += 1
-        else:
-            if testLabel[i] == 1:
-                falseNegative += 1
-            else:
-                trueNegative += 1
-
-    print('TP = {:3}  TN = {:3}'.format(truePositive, trueNegative))
-    print('FP = {:3}  FN = {:3}'.format(falsePositive, falseNegative))
+    confusion = metrics.ConfusionMatrix(positive=1).update(
+        testLabel, predictLabel, score)
 
-    if truePositive == 0:
-        return 0
+    if confusion.isBinary():
+        truePositive, falsePositive, falseNegative, trueNegative = confusion.counts()
+        print('TP = {:3}  TN = {:3}'.format(truePositive, trueNegative))
+        print('FP = {:3}  FN = {:3}'.format(falsePositive, falseNegative))
 
-    precision = truePositive / (truePositive + falsePositive)
-    recall = truePositive / (truePositive + falseNegative)
-
-    return (2 * precision * recall) / (precision + recall)
+    return confusion.f1()
 
 
 def gridSearch_Gaussian(trainData, trainLabel, testData, testLabel):
@@ -111,6 +66,8 @@ def gridSearch_Gaussian(trainData, trainLabel, testData, testLabel):
     网格搜索高斯核参数
     ==============
     '''
+    import SVM
+
     C = [np.power(2.0, i) for i in range(-5, 16, 2)]
     Sigma = [np.power(2.0, i) for i in range(-3, 8)]
     Epsilon = [np.power(10.0, i) for i in range(-6, 0)]
@@ -134,13 +91,55 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description='Simple machine learning test', epilog='PB17000297 罗晏宸 AI Programming Assignment 2', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
 
+    parser.add_argument('-o', '--save', metavar='file', dest='save', default=None,
+                        help='Save the trained model to a .npz file')
+    instrument.addArguments(parser)
+    parser.add_argument('-m', '--load', metavar='file', dest='load', default=None,
+                        help='Load a trained model from a .npz file and score without retraining')
+    parser.add_argument('-u', '--update', metavar='file', action='append', default=[],
+                        help='Incrementally update the (trained or loaded) model with this data file before predicting, may be repeated (LR only)')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='Do not show progress bars')
+    parser.add_argument('--target', default='pass', choices=['pass', 'band'],
+                        help='Label to predict: pass/fail, or one of five grade bands (multi-class, KNN and SVM); a loaded model keeps its own')
+    parser.add_argument('--encoding', default='ordinal', choices=['ordinal', 'onehot'],
+                        help='Encoding of categorical attributes, learned on the training data')
+    parser.add_argument('--scaling', default=None, choices=['none', 'minmax', 'zscore'],
+                        help='Feature scaling learned on the training data (default: minmax for SVM, none otherwise)')
+    parser.add_argument('--cache', metavar='dir', default=None,
+                        help='Cache transformed feature matrices in this directory (e.g. ../cache), keyed by file contents and pipeline (default: no cache)')
+    parser.add_argument('--dtype', default='float64', choices=['float64', 'float32'],
+                        help='Floating point type used for training and prediction (a loaded model keeps its own)')
+    parser.add_argument('--refresh', metavar='rate', default=10, type=float,
+                        help='Maximum progress bar refreshes per second (0 to redraw on every update)')
+    parser.add_argument('--store', metavar='file', default=None,
+                        help='Write the training matrix to a .npy file and train on it memory-mapped (KNN reads it block by block)')
+    parser.add_argument('--recall', action='store_true',
+                        help='Report the recall of approximate KNN neighbors against exact search on the test data')
+
     subparsers = parser.add_subparsers(
-        title='Learning Algorithms', dest='algorithm', required=True)
+        title='Learning Algorithms', dest='algorithm')
 
     parser_KNN = subparsers.add_parser(
         'KNN', help='k-Nearest Neighbors', description='k-Nearest Neighbors', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser_KNN.add_argument('-K', default=27, type=int,
                             help='Number of chosen neighbors')
+    parser_KNN.add_argument('--index', default=None, choices=['ivf', 'lsh'],
+                            help='Approximate neighbor search with an inverted file index or locality-sensitive hashing (default: exact search)')
+    parser_KNN.add_argument('--lists', metavar='n', default=None, type=int,
+                            help='Number of inverted lists of the ivf index (default: square root of the training size)')
+    parser_KNN.add_argument('--probes', metavar='n', default=8, type=int,
+                            help='Inverted lists searched per query by the ivf index')
+    parser_KNN.add_argument('--tables', metavar='n', default=16, type=int,
+                            help='Hash tables of the lsh index')
+    parser_KNN.add_argument('--hashes', metavar='n', default=4, type=int,
+                            help='Hash functions per table of the lsh index')
+    parser_KNN.add_argument('--width', metavar='w', default=None, type=float,
+                            help='Bucket width of the lsh index (default: estimated from the training data)')
+    parser_KNN.add_argument('--seed', default=0, type=int,
+                            help='Random seed of the index')
+    parser_KNN.set_defaults(
+        params=['K', 'index', 'lists', 'probes', 'tables', 'hashes', 'width', 'seed'])
 
     parser_SVM = subparsers.add_parser(
         'SVM', help='Support Vector Machine', description='Support Vector Machine', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -148,6 +147,12 @@ if __name__ == "__main__":
                             help='Soft margin penalty hyperparameter for support vector machine')
     parser_SVM.add_argument('-t', '--toler', metavar='xi', dest='epsilon', default=0.0001,
                             type=float, help='Slack variable (toler) for support vector machine')
+    parser_SVM.add_argument('--strategy', default='ovr', choices=['ovr', 'ovo'],
+                            help='Multi-class decomposition: one-vs-rest or one-vs-one')
+    parser_SVM.add_argument('-j', '--jobs', metavar='n', default=None, type=int,
+                            help='Processes solving multi-class subproblems in parallel (default: number of CPUs)')
+    parser_SVM.set_defaults(
+        params=['C', 'epsilon', 'kernel', 'sigma', 'p', 'approximation', 'components', 'seed', 'strategy', 'jobs'])
 
     subsubparsers = parser_SVM.add_subparsers(
         title='Kernel Functions', dest='kernel')
@@ -156,6 +161,12 @@ if __name__ == "__main__":
         'Gaussian', help='Gaussian kernel function(default)', description='Gaussian kernel function', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser_Gaussian.add_argument('-s', '--sigma', metavar='sigma', default=10, type=int,
                                  help='Parameter of gaussian kernel function for support vector machine')
+    parser_Gaussian.add_argument('-a', '--approximation', default=None, choices=['fourier', 'nystroem'],
+                                 help='Approximate the kernel with random Fourier features or Nystroem landmarks and train a linear model, without the kernel matrix')
+    parser_Gaussian.add_argument('-n', '--components', metavar='D', default=500, type=int,
+                                 help='Number of random features or landmarks of the approximation')
+    parser_Gaussian.add_argument('--seed', default=None, type=int,
+                                 help='Random seed of the approximation')
 
     parser_Linear = subsubparsers.add_parser(
         'Linear', help='Linear kernel function', description='Linear kernel function', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
@@ -171,46 +182,79 @@ if __name__ == "__main__":
                            default=200, type=int, help='Number of iteration')
     parser_LR.add_argument('-r', '--rate', metavar='alpha', dest='learning_rate',
                            default=0.0001, type=float, help='Rate of learning')
+    parser_LR.add_argument('-s', '--schedule', default='constant', choices=['constant', 'decay', 'adagrad', 'adam'],
+                           help='Learning rate schedule')
+    parser_LR.add_argument('-d', '--decay', metavar='gamma', default=0.001, type=float,
+                           help='Decay of the learning rate per update for the decay schedule')
+    parser_LR.set_defaults(
+        params=['iteration', 'learning_rate', 'schedule', 'decay'])
 
     args = parser.parse_args()
 
+    if args.algorithm == None and args.load == None:
+        parser.error('a learning algorithm or --load is required')
+    if args.update and args.algorithm not in (None, 'LR'):
+        parser.error('--update requires a model with partial_fit (LR)')
+
     if args.algorithm == 'SVM' and args.kernel == None:  # 默认核函数
         args.kernel = 'Gaussian'
         args.sigma = 10
 
+    progress.configure(quiet=args.quiet, refresh=args.refresh)
+    stats = instrument.fromArguments(args)  # 未指定统计参数时为 None
     start = time.time()
 
-    if args.algorithm == 'KNN':  # k-近邻算法
-        trainData, _, trainLabel = loadData(
-            '../data/student/student-por.csv', Methods='NearestNeighbors')  # 训练数据
-
-        testData, _, testLabel = loadData(
-            '../data/student/student-mat.csv', Methods='NearestNeighbors')  # 测试数据
-
-        predictLabel = KNN.predict(trainData, trainLabel, testData, K=args.K)
-
-    elif args.algorithm == 'SVM':  # 支持向量机算法
-        trainData, _, trainLabel = loadData(
-            '../data/student/student-por.csv', Normalize=True, Methods='SupportVectorMachine')  # 训练数据
-
-        testData, _, testLabel = loadData(
-            '../data/student/student-mat.csv', Normalize=True, Methods='SupportVectorMachine')  # 测试数据
-
-        predictLabel = SVM.predict(trainData, trainLabel, testData, C=args.C, epsilon=args.epsilon, kernel=args.kernel,
-                                   sigma=args.sigma if args.kernel == 'Gaussian' else None, p=args.p if args.kernel == 'Polynomial' else None)
-
-    elif args.algorithm == 'LR':  # Logistic 回归算法
-        trainData, _, trainLabel = loadData(
-            '../data/student/student-por.csv', Methods='LogisticRegression')  # 训练数据
-
-        testData, _, testLabel = loadData(
-            '../data/student/student-mat.csv', Methods='LogisticRegression')  # 测试数据
-
-        predictLabel = LR.predict(trainData, trainLabel, testData,
-                                  iteration=args.iteration, learning_rate=args.learning_rate)
+    with instrument.profile(args.profile):
+        if args.load != None:  # 加载已训练的模型，无需重新训练
+            model = estimator.load(args.load)
+        else:
+            model = estimator.create(args.algorithm, dtype=args.dtype, **{
+                name: getattr(args, name, None) for name in args.params})
+        model.stats = stats
+
+        if args.load == None:
+            pipeline = {'encoding': args.encoding, 'target': args.target}
+            if args.scaling != None:
+                pipeline['scaling'] = None if args.scaling == 'none' else args.scaling
+            model.pipeline = preprocess.Pipeline.forModel(model, **pipeline)
+            trainData, trainLabel = loadData(
+                '../data/student/student-por.csv', model.pipeline, fit=True, cache=args.cache)  # 训练数据，拟合流水线
+            if args.store != None:  # 训练数据矩阵改由内存映射文件提供
+                store.write(args.store, [trainData], dtype=model.dtype)
+                trainData = store.load(args.store)
+            model.fit(trainData, trainLabel)
+        elif model.pipeline == None:  # 之前保存的模型没有流水线，在训练数据上重新拟合
+            model.pipeline = preprocess.Pipeline.forModel(
+                model, target=args.target)
+            loadData('../data/student/student-por.csv',
+                     model.pipeline, fit=True, cache=args.cache)
+
+        for file in args.update:  # 增量更新，沿用已有权重与优化器状态
+            if not hasattr(model, 'partial_fit'):
+                parser.error('--update requires a model with partial_fit (LR)')
+            updateData, updateLabel = loadData(
+                file, model.pipeline, cache=args.cache)
+            model.partial_fit(updateData, updateLabel)
+
+        testData, testLabel = loadData(
+            '../data/student/student-mat.csv', model.pipeline, cache=args.cache)  # 测试数据，只做变换
+
+        if args.save != None:
+            model.save(args.save)
+
+        predictLabel = model.predict(testData)
+
+        if args.recall:
+            if getattr(model, 'index', None) is None:
+                parser.error('--recall requires a KNN model with --index')
+            import KNN
+            neighborRecall = KNN.recall(model, testData)
 
     # gridSearch_Gaussian(trainData, trainLabel, testData, testLabel)
 
     end = time.time()
+    instrument.export(stats, args)
     print('Elapsed time: {:.4}s'.format(end - start))
     print('F1 score: {:%}'.format(modelTest(testLabel, predictLabel)))
+    if args.recall:
+        print('Neighbor recall: {:%}'.format(neighborRecall))
@@ -0,0 +1,265 @@
+'''
+metrics
+===
+    由混淆矩阵计算模型评价指标
+Provides
+--------
+- 一次向量化计算混淆矩阵::
+
+    >>> matrix, labels = confusionMatrix(testLabel, predictLabel)
+
+- 可跨预测分块累计的混淆矩阵类::
+
+    >>> confusion = ConfusionMatrix(positive=1)
+    >>> confusion.update(testLabel, predictLabel, score=decisionValue)
+    >>> confusion.f1(), confusion.rocAUC()
+
+'''
+
+import numpy as np
+
+
+def confusionMatrix(trueLabel, predictLabel, labels=None):
+    '''
+    计算混淆矩阵
+    ==========
+    Arguments
+    ---------
+    - `trueLabel` 实际标签
+    - `predictLabel` 预测标签
+    - `labels` 有序的类别标签，`None` 表示取两者出现过的全部标签
+
+    Returns
+    -------
+    - `matrix` 混淆矩阵，`matrix[i, j]` 为实际类别 `labels[i]` 且预测类别 `labels[j]` 的样本数
+    - `labels` 类别标签
+    '''
+    trueLabel = np.asarray(trueLabel).ravel()
+    predictLabel = np.asarray(predictLabel).ravel()
+    if trueLabel.shape != predictLabel.shape:
+        raise ValueError('trueLabel and predictLabel differ in length')
+    if labels is None:
+        labels = np.union1d(trueLabel, predictLabel)
+    labels = np.asarray(labels)
+
+    k = labels.size
+    trueIndex = np.searchsorted(labels, trueLabel)
+    predictIndex = np.searchsorted(labels, predictLabel)
+    if k == 0 or np.any(labels[np.minimum(trueIndex, k - 1)] != trueLabel) or \
+            np.any(labels[np.minimum(predictIndex, k - 1)] != predictLabel):
+        if trueLabel.size > 0:
+            raise ValueError('label not in labels')
+    matrix = np.bincount(trueIndex * k + predictIndex,
+                         minlength=k * k).reshape(k, k)  # 一次遍历计数
+    return matrix, labels
+
+
+def rankAUC(trueLabel, score, positive=1):
+    '''
+    计算 ROC 曲线下面积
+    ================
+    Arguments
+    ---------
+    - `trueLabel` 实际标签
+    - `score` 预测为正类的得分（决策函数值或概率）
+    - `positive` 正类标签
+
+    Formula
+    -------
+        AUC = (Sum rank(positive) - n_+ (n_+ + 1) / 2) / (n_+ n_-)
+        - 即 Mann-Whitney U 统计量，得分相同的样本取平均秩
+
+    Returns
+    -------
+    - ROC-AUC，仅含一类样本时为 `nan`
+    '''
+    trueLabel = np.asarray(trueLabel).ravel()
+    score = np.asarray(score, dtype=float).ravel()
+    isPositive = trueLabel == positive
+    nPositive = int(isPositive.sum())
+    nNegative = isPositive.size - nPositive
+    if nPositive == 0 or nNegative == 0:
+        return float('nan')
+
+    uniqueScore, inverse, counts = np.unique(
+        score, return_inverse=True, return_counts=True)
+    averageRank = np.cumsum(counts) - (counts - 1) / 2  # 并列得分的平均秩
+    rankSum = averageRank[inverse.ravel()][isPositive].sum()
+    return float((rankSum - nPositive * (nPositive + 1) / 2) / (nPositive * nNegative))
+
+
+class ConfusionMatrix:
+    '''
+    可累计的混淆矩阵
+    =============
+    二分类时指标针对正类 `positive` 计算，多分类时取各类的宏平均；
+    是否按二分类计算由类别标签集合（或 `average`）决定，与某一块数据中实际出现几类无关
+
+    Methods
+    -------
+    - `update(trueLabel, predictLabel, score=None)` 累计一块预测结果
+    - `precision()` 精确率
+    - `recall()` 召回率
+    - `f1()` F1 值
+    - `accuracy()` 正确率
+    - `rocAUC()` ROC 曲线下面积（二分类且提供得分时）
+    - `report()` 全部指标
+    '''
+
+    def __init__(self, labels=None, positive=1, average=None):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `labels` 有序的类别标签，`None` 表示随累计的数据扩充
+        - `positive` 二分类的正类标签
+        - `average` 指标的计算方式
+            - `None` 类别标签至多两类且包含 `positive` 时按二分类，否则取宏平均
+            - `'binary'` 针对正类计算
+            - `'macro'` 取各类的宏平均
+        '''
+
+        if average not in (None, 'binary', 'macro'):
+            raise ValueError('unknown average ' + str(average))
+        self.positive = positive
+        self.average = average
+        self.labels = np.asarray([] if labels is None else labels)
+        self.__fixedLabels = labels is not None
+        self.matrix = np.zeros(
+            [self.labels.size, self.labels.size], dtype=np.int64)
+        self.__trueLabels = []  # 供 ROC-AUC 使用的实际标签分块
+        self.__scores = []  # 供 ROC-AUC 使用的得分分块
+
+    def update(self, trueLabel, predictLabel, score=None):
+        '''
+        累计一块预测结果
+        =============
+        Arguments
+        ---------
+        - `trueLabel` 实际标签
+        - `predictLabel` 预测标签
+        - `score` 预测为正类的得分，可选
+
+        Returns
+        -------
+        - `self`
+        '''
+        trueLabel = np.asarray(trueLabel).ravel()
+        predictLabel = np.asarray(predictLabel).ravel()
+
+        if not self.__fixedLabels:
+            labels = np.union1d(trueLabel, predictLabel)
+            if self.labels.size > 0:  # 空的初始标签不参与合并，标签保持数据的类型
+                labels = np.union1d(self.labels, labels)
+            if labels.size != self.labels.size:  # 出现新的类别，扩充矩阵
+                index = np.searchsorted(labels, self.labels)
+                matrix = np.zeros([labels.size, labels.size], dtype=np.int64)
+                matrix[np.ix_(index, index)] = self.matrix
+                self.labels, self.matrix = labels, matrix
+
+        self.matrix += confusionMatrix(trueLabel,
+                                       predictLabel, self.labels)[0]
+        if score is not None:
+            self.__trueLabels.append(trueLabel)
+            self.__scores.append(np.asarray(score, dtype=float).ravel())
+        return self
+
+    def isBinary(self):
+        '''
+        是否按二分类计算
+        '''
+        if self.average is not None:
+            return self.average == 'binary'
+        return self.labels.size <= 2 and np.any(self.labels == self.positive)
+
+    def counts(self):
+        '''
+        正类的四格计数
+        ============
+        Returns
+        -------
+        - `(TP, FP, FN, TN)`，预测为非正类的样本均视为预测为负类
+        '''
+        total = int(self.matrix.sum())
+        where = np.nonzero(self.labels == self.positive)[0]
+        if where.size == 0:
+            return 0, 0, 0, total
+        p = where[0]
+        truePositive = int(self.matrix[p, p])
+        falsePositive = int(self.matrix[:, p].sum()) - truePositive
+        falseNegative = int(self.matrix[p, :].sum()) - truePositive
+        trueNegative = total - truePositive - falsePositive - falseNegative
+        return truePositive, falsePositive, falseNegative, trueNegative
+
+    def __perClass(self):
+        diagonal = np.diag(self.matrix).astype(float)
+        predicted = self.matrix.sum(axis=0)
+        actual = self.matrix.sum(axis=1)
+        precision = np.divide(diagonal, predicted, out=np.zeros_like(
+            diagonal), where=predicted > 0)
+        recall = np.divide(diagonal, actual, out=np.zeros_like(
+            diagonal), where=actual > 0)
+        present = actual > 0  # 宏平均只计实际出现的类别
+        return precision[present], recall[present]
+
+    def precision(self):
+        '''
+        精确率 TP / (TP + FP)，分母为零时为 0
+        '''
+        if self.isBinary():
+            truePositive, falsePositive, _, _ = self.counts()
+            return truePositive / (truePositive + falsePositive) if truePositive + falsePositive > 0 else 0.0
+        return float(np.mean(self.__perClass()[0]))
+
+    def recall(self):
+        '''
+        召回率 TP / (TP + FN)，分母为零时为 0
+        '''
+        if self.isBinary():
+            truePositive, _, falseNegative, _ = self.counts()
+            return truePositive / (truePositive + falseNegative) if truePositive + falseNegative > 0 else 0.0
+        return float(np.mean(self.__perClass()[1]))
+
+    def f1(self):
+        '''
+        F1 值 2 * precision * recall / (precision + recall)，分母为零时为 0
+        '''
+        if self.isBinary():
+            precision, recall = self.precision(), self.recall()
+            return 2 * precision * recall / (precision + recall) if precision + recall > 0 else 0.0
+        precision, recall = self.__perClass()
+        denominator = precision + recall
+        return float(np.mean(np.divide(2 * precision * recall, denominator,
+                                       out=np.zeros_like(denominator), where=denominator > 0)))
+
+    def accuracy(self):
+        '''
+        正确率
+        '''
+        total = self.matrix.sum()
+        return float(np.trace(self.matrix) / total) if total > 0 else 0.0
+
+    def rocAUC(self):
+        '''
+        ROC 曲线下面积，未提供得分或非二分类时为 `nan`
+        '''
+        if not self.__scores or not self.isBinary():
+            return float('nan')
+        return rankAUC(np.concatenate(self.__trueLabels), np.concatenate(self.__scores), self.positive)
+
+    def report(self):
+        '''
+        全部指标
+        ======
+        Returns
+        -------
+        - 以指标名为键的字典
+        '''
+        return {
+            'precision': self.precision(),
+            'recall': self.recall(),
+            'f1': self.f1(),
+            'accuracy': self.accuracy(),
+            'rocAUC': self.rocAUC(),
+        }
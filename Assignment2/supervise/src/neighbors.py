@@ -0,0 +1,347 @@
+'''
+neighbors
+===
+    最近邻检索的精确与近似索引
+Provides
+--------
+- 批量计算向量间距离::
+
+    >>> distanceMatrix(A, B, metric='Manhattan')
+
+- 倒排文件索引(IVF)，以 k-means 质心划分训练数据，查询时只检索最近的 `probes` 个划分::
+
+    >>> index = InvertedFileIndex(lists=256, probes=8).fit(trainData)
+    >>> neighbors, distances = index.search(testData, K=27)
+
+- 随机投影的局部敏感哈希(LSH)，`tables` 张哈希表，每张由 `hashes` 个 p-stable 投影组成键::
+
+    >>> index = HashIndex(tables=16, hashes=4).fit(trainData)
+
+- 近似检索的召回率::
+
+    >>> recall(approximateNeighbors, exactNeighbors)
+
+Notes
+-----
+- 候选近邻不足 K 个的查询退回精确检索，结果总是 K 个近邻
+- 候选近邻以精确距离重新排序，索引只影响召回率而不影响距离
+'''
+
+import numpy as np
+
+BLOCK_ELEMENTS = 1 << 24  # 每块距离计算的中间数组元素数上限
+QUERY_ROWS = 256  # 精确检索时每块查询的数目
+
+
+def distanceMatrix(A, B, metric='Manhattan'):
+    '''
+    批量计算向量间距离
+    ===============
+    Arguments
+    ---------
+    - `A` 数据矩阵，每行为一个向量
+    - `B` 数据矩阵，每行为一个向量
+    - `metric` 距离
+        - `'Manhattan'` 曼哈顿距离
+        - `'Euclidean'` 欧几里得距离
+
+    Returns
+    -------
+    - 距离矩阵，第 i 行第 j 列为 `A[i]` 与 `B[j]` 间的距离
+    '''
+    if metric == 'Manhattan':
+        return np.sum(np.abs(A[:, np.newaxis, :] - B[np.newaxis, :, :]), axis=2)
+    elif metric == 'Euclidean':
+        squared = np.sum(np.square(A), axis=1)[:, np.newaxis] + \
+            np.sum(np.square(B), axis=1)[np.newaxis, :] - 2 * A @ B.T
+        return np.sqrt(np.maximum(squared, 0))
+    raise ValueError('unknown metric ' + str(metric))
+
+
+def exactNeighbors(data, queries, K, metric='Manhattan'):
+    '''
+    分块的精确 k-近邻检索
+    ==================
+    Arguments
+    ---------
+    - `data` 训练数据矩阵，可以是内存映射的 `.npy` 文件（见 `common/store.py`）
+    - `queries` 查询矩阵
+    - `K` 近邻数目
+    - `metric` 距离
+
+    Algorithm
+    ---------
+    按行顺序读取训练数据块，每块与各查询块计算距离，
+    与目前的 K 个近邻合并后以 `argpartition` 保留最近的 K 个（running top-K），
+    训练数据只顺序读取一遍，且同一时刻只有一块在内存中
+
+    Returns
+    -------
+    - 第 i 行为查询 i 的 K 个近邻的下标（不排序）
+    '''
+    K = min(K, data.shape[0])
+    queryRows = min(QUERY_ROWS, max(1, queries.shape[0]))
+    chunkRows = max(K, BLOCK_ELEMENTS //
+                    (queryRows * data.shape[1]))  # 限制中间数组大小
+    bestDistance = [None] * len(range(0, queries.shape[0], queryRows))
+    bestIndex = [None] * len(bestDistance)
+    for chunkBegin in range(0, data.shape[0], chunkRows):
+        chunk = np.asarray(
+            data[chunkBegin:chunkBegin + chunkRows], dtype=queries.dtype)  # 顺序读取一块训练数据
+        chunkIndex = np.arange(chunkBegin, chunkBegin + chunk.shape[0])
+        for b, begin in enumerate(range(0, queries.shape[0], queryRows)):
+            block = queries[begin:begin + queryRows]
+            distance = distanceMatrix(block, chunk, metric)
+            index = np.broadcast_to(chunkIndex, distance.shape)
+            if bestDistance[b] is not None:  # 与目前的近邻合并
+                distance = np.concatenate((bestDistance[b], distance), axis=1)
+                index = np.concatenate((bestIndex[b], index), axis=1)
+            if K < distance.shape[1]:
+                nearest = np.argpartition(distance, K, axis=1)[:, :K]  # k-近邻
+                distance = np.take_along_axis(distance, nearest, axis=1)
+                index = np.take_along_axis(index, nearest, axis=1)
+            bestDistance[b], bestIndex[b] = distance, np.array(index)
+    if not bestIndex:
+        return np.empty([0, K], dtype=np.int64)
+    return np.concatenate(bestIndex).astype(np.int64, copy=False)
+
+
+def bucketize(keys):
+    '''
+    按键分组
+    ======
+    Arguments
+    ---------
+    - `keys` 各行的整数键，一维（划分编号）或二维（哈希码）
+
+    Returns
+    -------
+    - `order` 按键排序的行下标
+    - `offsets` 第 b 组为 `order[offsets[b]:offsets[b + 1]]`
+    - `unique` 各组的键
+    '''
+    unique, inverse = np.unique(keys, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    order = np.argsort(inverse, kind='stable')
+    offsets = np.concatenate(
+        ([0], np.cumsum(np.bincount(inverse, minlength=unique.shape[0]))))
+    return order, offsets, unique
+
+
+class Index:
+    '''
+    近似索引基类
+    ==========
+    子类实现 `fit` 与 `candidates`，基类以精确距离重排候选近邻
+
+    Methods
+    -------
+    - `fit(data)` 建立索引
+    - `candidates(queries)` 各查询的候选近邻下标
+    - `search(queries, K)` 近似 k-近邻检索
+    '''
+
+    metric = 'Manhattan'
+
+    def fit(self, data):
+        raise NotImplementedError
+
+    def candidates(self, queries):
+        raise NotImplementedError
+
+    def search(self, queries, K):
+        '''
+        近似 k-近邻检索
+        =============
+        Arguments
+        ---------
+        - `queries` 查询矩阵
+        - `K` 近邻数目
+
+        Returns
+        -------
+        - `neighbors` 第 i 行为查询 i 的 K 个近邻的下标
+        - `distances` 计算的距离数目
+        '''
+        K = min(K, self.data.shape[0])
+        neighbors = np.empty([queries.shape[0], K], dtype=np.int64)
+        distances = 0
+        short = []  # 候选不足 K 个的查询
+        for i, candidate in enumerate(self.candidates(queries)):
+            if candidate.size < K:
+                short.append(i)
+                continue
+            distance = distanceMatrix(
+                queries[i:i + 1], self.data[candidate], self.metric)[0]
+            distances += candidate.size
+            if K < candidate.size:
+                neighbors[i] = candidate[np.argpartition(distance, K)[:K]]
+            else:
+                neighbors[i] = candidate
+        if short:  # 候选不足的查询一起退回分块的精确检索，训练数据只读取一遍
+            neighbors[short] = exactNeighbors(
+                self.data, queries[short], K, self.metric)
+            distances += len(short) * self.data.shape[0]
+        return neighbors, distances
+
+
+class InvertedFileIndex(Index):
+    '''
+    倒排文件索引
+    ==========
+    以 k-means 质心（粗量化器）将训练数据划分为 `lists` 个倒排表，
+    查询时检索质心最近的 `probes` 个倒排表中的数据
+    '''
+
+    def __init__(self, lists=None, probes=8, metric='Manhattan', seed=0, iterations=10):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `lists` 倒排表数目，`None` 为训练数据数目的平方根
+        - `probes` 每次查询检索的倒排表数目，越大召回率越高、速度越慢
+        - `metric` 距离
+        - `seed` 随机数种子
+        - `iterations` k-means 的迭代次数
+        '''
+
+        self.lists = lists
+        self.probes = probes
+        self.metric = metric
+        self.seed = seed
+        self.iterations = iterations
+
+    def __assign(self, data):
+        '''
+        分块计算各数据最近的质心（欧几里得距离）
+        '''
+        result = np.empty(data.shape[0], dtype=np.int64)
+        blockSize = max(1, BLOCK_ELEMENTS // self.centroids.size)
+        for begin in range(0, data.shape[0], blockSize):
+            result[begin:begin + blockSize] = np.argmin(distanceMatrix(
+                data[begin:begin + blockSize], self.centroids, 'Euclidean'), axis=1)
+        return result
+
+    def fit(self, data):
+        '''
+        建立索引
+        ======
+        在至多 256 * lists 个采样数据上运行 k-means 得到质心，再将全部数据分配到最近的质心
+        '''
+        self.data = data
+        lists = self.lists or max(1, int(np.sqrt(data.shape[0])))
+        lists = min(lists, data.shape[0])
+        rng = np.random.default_rng(self.seed)
+        sample = data[rng.choice(data.shape[0], min(
+            data.shape[0], 256 * lists), replace=False)]
+        self.centroids = sample[rng.choice(
+            sample.shape[0], lists, replace=False)].astype(np.float64)  # Forgy 初始化
+        for _ in range(self.iterations):
+            assignment = self.__assign(sample)
+            counts = np.bincount(assignment, minlength=lists)
+            sums = np.zeros_like(self.centroids)
+            np.add.at(sums, assignment, sample)
+            nonempty = counts > 0  # 空簇保留原质心
+            self.centroids[nonempty] = sums[nonempty] / \
+                counts[nonempty, np.newaxis]
+        self.centroids = self.centroids.astype(data.dtype)
+        self.order, self.offsets, _ = bucketize(self.__assign(data))
+        return self
+
+    def candidates(self, queries):
+        probes = min(self.probes, self.centroids.shape[0])
+        nearest = np.argpartition(distanceMatrix(
+            queries, self.centroids, 'Euclidean'), probes - 1, axis=1)[:, :probes]
+        for lists in nearest:
+            yield np.concatenate([self.order[self.offsets[j]:self.offsets[j + 1]] for j in lists])
+
+
+class HashIndex(Index):
+    '''
+    p-stable 局部敏感哈希
+    ===================
+    Formula
+    -------
+        h(x) = floor((a^T x + b) / w)，欧几里得距离时 a ~ N(0, I)，曼哈顿距离时 a ~ Cauchy
+        每张表的键由 `hashes` 个 h 组成，查询检索各表中与其键相同的数据
+    '''
+
+    def __init__(self, tables=16, hashes=4, width=None, metric='Manhattan', seed=0):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `tables` 哈希表数目，越多召回率越高、速度越慢
+        - `hashes` 每张表的哈希函数数目，越多每个桶越小、召回率越低
+        - `width` 桶宽 w，`None` 时取 256 个采样数据在 1024 个采样中最近邻距离中位数的 2 倍；
+          桶越宽候选越多，4 倍时每个桶约有数据的 40%，检索比精确检索还慢
+        - `metric` 距离
+        - `seed` 随机数种子
+        '''
+
+        self.tables = tables
+        self.hashes = hashes
+        self.width = width
+        self.metric = metric
+        self.seed = seed
+
+    def __codes(self, data, t):
+        return np.floor((data @ self.projections[t] + self.offsets[t]) / self.bucketWidth).astype(np.int64)
+
+    def fit(self, data):
+        '''
+        建立索引
+        ======
+        '''
+        self.data = data
+        rng = np.random.default_rng(self.seed)
+        if self.width is None:  # 估计近邻距离的尺度
+            sample = data[rng.choice(data.shape[0], min(
+                data.shape[0], 1024), replace=False)]
+            distance = distanceMatrix(sample[:256], sample, self.metric)
+            np.fill_diagonal(distance, np.inf)  # 前 256 个采样与自身的距离
+            nearest = np.min(distance, axis=1)
+            self.bucketWidth = 2 * \
+                float(np.median(nearest[np.isfinite(nearest)])) or 1.0
+        else:
+            self.bucketWidth = self.width
+        shape = (self.tables, data.shape[1], self.hashes)
+        self.projections = (rng.standard_cauchy(shape) if self.metric == 'Manhattan'
+                            else rng.standard_normal(shape)).astype(data.dtype)
+        self.offsets = rng.uniform(
+            0, self.bucketWidth, (self.tables, self.hashes)).astype(data.dtype)
+        self.buckets = []  # 每张表：(键 -> 桶编号, 行下标, 桶起始位置)
+        for t in range(self.tables):
+            order, offsets, unique = bucketize(self.__codes(data, t))
+            self.buckets.append(({key: b for b, key in enumerate(map(tuple, unique.tolist()))},
+                                 order, offsets))
+        return self
+
+    def candidates(self, queries):
+        codes = [self.__codes(queries, t).tolist() for t in range(self.tables)]
+        for i in range(queries.shape[0]):
+            found = []
+            for t, (keys, order, offsets) in enumerate(self.buckets):
+                b = keys.get(tuple(codes[t][i]))
+                if b is not None:
+                    found.append(order[offsets[b]:offsets[b + 1]])
+            yield np.unique(np.concatenate(found)) if found else np.empty(0, dtype=np.int64)
+
+
+def recall(approximate, exact):
+    '''
+    近似检索的召回率
+    =============
+    Arguments
+    ---------
+    - `approximate` 近似检索的近邻下标矩阵
+    - `exact` 精确检索的近邻下标矩阵
+
+    Returns
+    -------
+    - 精确 k-近邻中被近似检索找到的比例
+    '''
+    found = sum(np.intersect1d(a, e).size for a, e in zip(approximate, exact))
+    return found / exact.size
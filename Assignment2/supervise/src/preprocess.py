@@ -0,0 +1,322 @@
+'''
+preprocess
+===
+    在训练数据上拟合、随模型保存的预处理流水线
+Provides
+--------
+- 读取学生数据集的原始记录::
+
+    >>> records = readRecords('../data/student/student-por.csv')
+
+- 在训练数据上拟合类别编码、缩放与标签映射，之后的数据只做变换，不再拟合::
+
+    >>> pipeline = Pipeline(encoding='onehot', scaling='minmax', target='pass')
+    >>> trainData = pipeline.fit(records).transform(records)
+    >>> trainLabel = pipeline.labels(records)
+
+- 按模型的约定创建流水线（SVM 缩放到 [0, 1]、不及格标签为 -1）::
+
+    >>> pipeline = Pipeline.forModel(model, target='band')
+
+- 加载并变换数据文件，结果缓存在磁盘上，键为文件内容与流水线配置（及拟合状态）的哈希::
+
+    >>> trainData, trainLabel = transformFile(trainFile, pipeline, fit=True, cache='../cache')
+    >>> testData, testLabel = transformFile(testFile, pipeline, cache='../cache')
+
+Notes
+-----
+- 类别按取值排序编码，与拟合时未出现的类别取值视为错误，测试数据与训练数据的编码总是一致
+- 流水线的状态由 `Estimator.save` 与模型一同保存，`estimator.load` 时恢复
+'''
+
+import csv
+import hashlib
+import json
+import os
+import tempfile
+
+import numpy as np
+
+CATEGORICAL = [0, 1, 3, 4, 5, 8, 9, 10, 11, 15,
+               16, 17, 18, 19, 20, 21, 22]  # 二元或名义属性所在列
+NUMERIC = [2, 6, 7, 12, 13, 14, 23, 24, 25, 26, 27, 28, 29]  # 数值属性所在列
+GRADES = [30, 31]  # G1、G2 所在列
+FEATURES = 32  # 特征列数，其后为 G3
+TARGET = 32  # G3 所在列
+GRADE_BANDS = [10, 12, 14, 16]  # 成绩等级的下界：0-9 不及格，10-11 及格，12-13 中，14-15 良，16-20 优
+
+
+def readRecords(file):
+    '''
+    读取原始记录
+    ==========
+    Arguments
+    ---------
+    - `file` 以 `;` 分隔、带表头的数据集文件
+
+    Returns
+    -------
+    - 字符串矩阵，每行为一条记录
+    '''
+    print('start reading ' + file)
+    with open(file, 'r') as fileStream:
+        lines = csv.reader(fileStream, delimiter=';')
+        next(lines)  # 跳过表头
+        return np.array([line for line in lines if line], dtype=str)
+
+
+class Pipeline:
+    '''
+    预处理流水线
+    ==========
+    Methods
+    -------
+    - `fit(records)` 在训练记录上拟合类别取值与缩放参数
+    - `transform(records)` 一次向量化的变换，得到特征矩阵
+    - `fit_transform(records)` 拟合并变换，只编码一次
+    - `labels(records)` 由 G3 得到类别标签
+    - `getParams()`、`getState()`、`setState(state)` 配置与拟合状态
+    - `forModel(model, **params)` 按模型的约定创建
+    '''
+
+    def __init__(self, encoding='ordinal', scaling=None, target='pass', negative=0, dtype='float64'):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `encoding` 类别属性的编码
+            - `'ordinal'` 按取值排序编码为 0, 1, ...
+            - `'onehot'` 独热编码，每个取值一列
+        - `scaling` 缩放，`None`、`'minmax'`（缩放到 [0, 1]）或 `'zscore'`（Z-Score 标准化）
+        - `target` 类别标签，`'pass'` 是否及格或 `'band'` 成绩等级 0-4（见 `GRADE_BANDS`）
+        - `negative` `'pass'` 时不及格的标签，0 或 -1
+        - `dtype` 特征矩阵的浮点类型
+        '''
+
+        if encoding not in ('ordinal', 'onehot'):
+            raise ValueError('unknown encoding ' + str(encoding))
+        if scaling not in (None, 'minmax', 'zscore'):
+            raise ValueError('unknown scaling ' + str(scaling))
+        self.encoding = encoding
+        self.scaling = scaling
+        self.target = target
+        self.negative = negative
+        self.dtype = np.dtype(dtype)
+        self.categories = None  # 各类别属性的取值，拟合后设置
+
+    @classmethod
+    def forModel(cls, model, **params):
+        '''
+        按模型的约定创建流水线
+        ==================
+        Arguments
+        ---------
+        - `model` 分类器，由其 `normalize` 与 `methods` 属性决定缺省的缩放与不及格标签
+        - `params` 覆盖缺省值的构造参数
+
+        Returns
+        -------
+        - 未拟合的流水线
+        '''
+        defaults = {'scaling': 'minmax' if model.normalize else None,
+                    'negative': -1 if model.methods == 'SupportVectorMachine' else 0,
+                    'dtype': model.dtype.name}
+        defaults.update(params)
+        return cls(**defaults)
+
+    def __layout(self):
+        '''
+        各输入列在特征矩阵中的起始列与列数
+        '''
+        widths = np.ones(FEATURES, dtype=np.int64)
+        if self.encoding == 'onehot':
+            widths[CATEGORICAL] = [categories.size for categories in self.categories]
+        starts = np.concatenate(([0], np.cumsum(widths)[:-1]))
+        return starts, int(widths.sum())
+
+    def __encode(self, records):
+        '''
+        编码类别属性并转换数值属性，不缩放
+        '''
+        if self.categories is None:
+            raise ValueError('pipeline is not fitted')
+        records = np.atleast_2d(np.asarray(records, dtype=str))
+        if records.shape[1] < FEATURES:
+            raise ValueError('records have {} columns, expected at least {}'.format(
+                records.shape[1], FEATURES))
+        starts, width = self.__layout()
+        result = np.zeros([records.shape[0], width], dtype=self.dtype)
+        numeric = NUMERIC + GRADES
+        result[:, starts[numeric]] = records[:, numeric].astype(self.dtype)
+        rows = np.arange(records.shape[0])
+        for column, categories in zip(CATEGORICAL, self.categories):
+            values = records[:, column]
+            codes = np.searchsorted(categories, values)
+            unknown = (codes >= categories.size) | (
+                categories[np.minimum(codes, categories.size - 1)] != values)
+            if np.any(unknown):
+                raise ValueError('unknown value {!r} in column {}'.format(
+                    values[unknown][0], column))
+            if self.encoding == 'onehot':
+                result[rows, starts[column] + codes] = 1
+            else:
+                result[:, starts[column]] = codes
+        return result
+
+    def fit(self, records):
+        '''
+        拟合流水线
+        ========
+        Arguments
+        ---------
+        - `records` 训练数据的原始记录
+
+        Returns
+        -------
+        - `self`
+        '''
+        self.fit_transform(records)
+        return self
+
+    def fit_transform(self, records):
+        '''
+        拟合并变换训练记录
+        ===============
+        Arguments
+        ---------
+        - `records` 训练数据的原始记录
+
+        Returns
+        -------
+        - 特征矩阵
+        '''
+        records = np.atleast_2d(np.asarray(records, dtype=str))
+        self.categories = [np.unique(records[:, column]) for column in CATEGORICAL]
+        self.offset = self.scale = None
+        result = self.__encode(records)
+        if self.scaling is not None:
+            encoded = result.astype(np.float64)  # 以双精度计算缩放参数
+            if self.scaling == 'minmax':
+                self.offset = encoded.min(axis=0)
+                spread = encoded.max(axis=0) - self.offset
+            else:
+                self.offset = encoded.mean(axis=0)
+                spread = encoded.std(axis=0)
+            self.scale = 1 / np.where(spread > 0, spread, 1)  # 常数列不缩放
+            result -= self.offset.astype(self.dtype)
+            result *= self.scale.astype(self.dtype)
+        return result
+
+    def transform(self, records):
+        '''
+        变换原始记录
+        ==========
+        Arguments
+        ---------
+        - `records` 原始记录，至少包含前 32 列（G3 可省略）
+
+        Returns
+        -------
+        - 特征矩阵
+        '''
+        result = self.__encode(records)
+        if self.scaling is not None:
+            result -= self.offset.astype(self.dtype)
+            result *= self.scale.astype(self.dtype)
+        return result
+
+    def labels(self, records):
+        '''
+        类别标签
+        ======
+        Arguments
+        ---------
+        - `records` 包含 G3 的原始记录
+
+        Returns
+        -------
+        - `'pass'` 时为 1 与 `negative`，`'band'` 时为 0-4
+        '''
+        grades = np.atleast_2d(np.asarray(records))[:, TARGET].astype(np.int64)
+        if self.target == 'band':
+            return np.searchsorted(GRADE_BANDS, grades, side='right')
+        return np.where(grades >= 10, 1, self.negative)  # G3 >= 10 为及格
+
+    def getParams(self):
+        return {'encoding': self.encoding, 'scaling': self.scaling, 'target': self.target,
+                'negative': self.negative, 'dtype': self.dtype.name}
+
+    def getState(self):
+        state = {'categories{}'.format(i): categories
+                 for i, categories in enumerate(self.categories)}
+        if self.scaling is not None:
+            state.update({'offset': self.offset, 'scale': self.scale})
+        return state
+
+    def setState(self, state):
+        self.categories = [state['categories{}'.format(i)]
+                           for i in range(len(CATEGORICAL))]
+        self.offset = state.get('offset')
+        self.scale = state.get('scale')
+
+
+def cacheKey(file, pipeline, fit):
+    '''
+    缓存的键
+    ======
+    文件内容、流水线配置与是否拟合的哈希；只变换时还包括拟合状态，拟合状态不同的流水线不共用缓存
+    '''
+    digest = hashlib.sha256()
+    with open(file, 'rb') as fileStream:
+        for block in iter(lambda: fileStream.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps([pipeline.getParams(), fit], sort_keys=True).encode())
+    if not fit:
+        for name, value in sorted(pipeline.getState().items()):
+            digest.update(name.encode())
+            digest.update(np.ascontiguousarray(value).tobytes())
+    return digest.hexdigest()
+
+
+def transformFile(file, pipeline, fit=False, cache=None):
+    '''
+    加载并变换数据文件
+    ===============
+    Arguments
+    ---------
+    - `file` 数据集文件
+    - `pipeline` 预处理流水线
+    - `fit` 是否先在该文件上拟合流水线（训练数据）
+    - `cache` 缓存目录，`None` 表示不缓存
+
+    Returns
+    -------
+    - `Data` 特征矩阵
+    - `Label` 类别标签
+    '''
+    if cache is not None:
+        cached = os.path.join(cache, cacheKey(file, pipeline, fit) + '.npz')
+        if os.path.exists(cached):
+            with np.load(cached, allow_pickle=False) as archive:
+                if fit:  # 缓存中保存了拟合状态，无需重新拟合
+                    pipeline.setState({key[len('pipeline.'):]: archive[key]
+                                       for key in archive.files if key.startswith('pipeline.')})
+                return archive['data'], archive['label']
+
+    records = readRecords(file)
+    Data = pipeline.fit_transform(records) if fit else pipeline.transform(records)
+    Label = pipeline.labels(records)
+
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=cache, suffix='.npz')  # 每次写入使用唯一的临时文件
+        try:
+            with os.fdopen(descriptor, 'wb') as fileStream:  # 写完后再改名，并发的读取不会看到不完整的文件
+                np.savez(fileStream, data=Data, label=Label, **{
+                    'pipeline.' + key: value for key, value in pipeline.getState().items()})
+            os.replace(temporary, cached)
+        except BaseException:
+            os.remove(temporary)
+            raise
+    return Data, Label
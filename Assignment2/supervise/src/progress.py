@@ -0,0 +1,158 @@
+'''
+progress
+===
+    可关闭、限制刷新率的进度条
+Provides
+--------
+- 全局设置，`quiet=True` 时不显示任何进度条，也不导入 `rich`::
+
+    >>> configure(quiet=False, refresh=10)
+
+- 创建进度条，`advance` 只累计进度，按不超过 `refresh` 次每秒的频率刷新显示::
+
+    >>> with bar('[cyan]predicting...', total=len(testData)) as testTask:
+    ...     testTask.advance(len(block))
+
+Notes
+-----
+- `advance` 是线程安全的；进程池等并行路径中由父进程在收到各子任务结果时调用 `advance`
+'''
+
+import threading
+import time
+
+QUIET = False  # 是否关闭进度条
+REFRESH = 10  # 每秒最多刷新次数
+
+COLUMNS = {  # 进度条样式
+    'count': "[progress.percentage]{task.completed}/{task.total}",
+    'percentage': "[progress.percentage]{task.percentage:>3.0f}%",
+}
+
+
+def configure(quiet=None, refresh=None):
+    '''
+    全局设置
+    ======
+    Arguments
+    ---------
+    - `quiet` 是否关闭进度条
+    - `refresh` 每秒最多刷新次数，0 表示每次更新都刷新
+    '''
+    global QUIET, REFRESH
+    if quiet is not None:
+        QUIET = quiet
+    if refresh is not None:
+        REFRESH = refresh
+
+
+class NullBar:
+    '''
+    关闭时使用的空进度条
+    '''
+
+    def advance(self, n=1):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+class Bar:
+    '''
+    限制刷新率的进度条
+    ===============
+    Methods
+    -------
+    - `advance(n=1)` 累计进度
+    - `close()` 刷新剩余进度并结束显示
+    '''
+
+    def __init__(self, description, total, columns='count', elapsed=False, refresh=None):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `description` 描述
+        - `total` 总量
+        - `columns` 进度样式，`'count'` 或 `'percentage'`
+        - `elapsed` 是否显示已用时间，否则显示剩余时间
+        - `refresh` 每秒最多刷新次数，缺省为全局设置，0 表示每次更新都刷新
+        '''
+        from rich.progress import (
+            BarColumn,
+            TimeRemainingColumn,
+            Progress,
+        )  # 仅在显示进度条时导入
+
+        self.__progress = Progress(
+            "[progress.description]{task.description}",
+            BarColumn(bar_width=None),
+            COLUMNS[columns],
+            "•",
+            "[time]{task.elapsed:.2f}s" if elapsed else TimeRemainingColumn(),
+            auto_refresh=False,
+        )  # rich 进度条，由本类控制刷新
+        self.__progress.start()
+        self.__task = self.__progress.add_task(description, total=total)
+        refresh = REFRESH if refresh is None else refresh
+        self.__interval = 1 / refresh if refresh > 0 else 0  # 刷新间隔，不大于 0 时不限制
+        self.__pending = 0  # 尚未显示的进度
+        self.__last = time.perf_counter()
+        self.__lock = threading.Lock()
+
+    def advance(self, n=1):
+        '''
+        累计进度，距上次刷新超过刷新间隔时才更新显示
+        '''
+        with self.__lock:
+            self.__pending += n
+            now = time.perf_counter()
+            if now - self.__last >= self.__interval:
+                self.__progress.update(
+                    self.__task, advance=self.__pending, refresh=True)
+                self.__pending = 0
+                self.__last = now
+
+    def close(self):
+        '''
+        刷新剩余进度并结束显示
+        '''
+        with self.__lock:
+            self.__progress.update(
+                self.__task, advance=self.__pending, refresh=True)
+            self.__pending = 0
+            self.__progress.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+def bar(description, total, columns='count', elapsed=False):
+    '''
+    创建进度条
+    ========
+    Arguments
+    ---------
+    - `description` 描述
+    - `total` 总量
+    - `columns` 进度样式，`'count'` 或 `'percentage'`
+    - `elapsed` 是否显示已用时间，否则显示剩余时间
+
+    Returns
+    -------
+    - 关闭时为 `NullBar`，否则为 `Bar`
+    '''
+    if QUIET:
+        return NullBar()
+    return Bar(description, total, columns, elapsed)
@@ -0,0 +1,442 @@
+'''
+server
+===
+    常驻的模型评分服务，将并发请求合并为小批量
+Provides
+--------
+- 一次性加载已保存的模型（见 `main.py -o`），监听本地 HTTP 端口或 Unix 套接字::
+
+    > python server.py -m knn.npz lr.npz svm.npz --port 8000
+    > python server.py -m pass=svm.npz --unix /tmp/score.sock
+
+- 预测单条或批量记录，`model` 为模型名称（缺省为文件名去掉扩展名），只加载一个模型时可省略；
+  `scores` 为真时同时返回决策函数值::
+
+    > curl -d '{"model": "svm", "instances": [[...], [...]]}' localhost:8000/predict
+    > curl -d '{"instance": [...], "scores": true}' localhost:8000/predict
+
+- 预测原始记录（数据集文件中的 32 个属性值），由随模型保存的预处理流水线变换::
+
+    > curl -d '{"model": "svm", "records": [["GP", "F", 18, "U", ...]]}' localhost:8000/predict
+
+- 查询已加载的模型、各模型的延迟分位数与吞吐量::
+
+    > curl localhost:8000/models
+    > curl localhost:8000/stats
+
+Notes
+-----
+- `instance`、`instances` 为 `main.loadData` 变换后的特征向量，`records` 为原始记录；
+  流水线只做变换，不会在服务中重新拟合
+- 同一模型的并发请求在 `--max-delay` 毫秒内合并为至多 `--max-batch` 条记录，
+  由该模型的工作线程调用一次向量化的 `predict`，事件循环不被阻塞
+- 批量中有请求出错（如特征数不符）时逐个请求重新预测，只有出错的请求返回错误
+'''
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import estimator
+
+sys.path.append(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', '..', 'common'))
+import instrument  # 分阶段计时与计数
+
+LATENCY_WINDOW = 10000  # 计算延迟分位数的最近请求数
+MAX_BODY = 1 << 26  # 请求体的最大字节数
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+           405: 'Method Not Allowed', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class Metrics:
+    '''
+    延迟与吞吐量统计
+    =============
+    Methods
+    -------
+    - `request(records, latency)` 记录一个完成的请求
+    - `batch(records)` 记录一次批量预测
+    - `error()` 记录一个出错的请求
+    - `asDict()` 请求数、记录数、吞吐量、平均批量大小与延迟分位数
+    '''
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.requests = 0  # 完成的请求数
+        self.records = 0  # 预测的记录数
+        self.errors = 0  # 出错的请求数
+        self.batches = 0  # 批量预测次数
+        self.batchRecords = 0  # 批量预测的记录总数
+        self.latencies = deque(maxlen=LATENCY_WINDOW)  # 最近请求的延迟（秒）
+
+    def request(self, records, latency):
+        self.requests += 1
+        self.records += records
+        self.latencies.append(latency)
+
+    def batch(self, records):
+        self.batches += 1
+        self.batchRecords += records
+
+    def error(self):
+        self.errors += 1
+
+    def asDict(self):
+        uptime = time.perf_counter() - self.started
+        result = {
+            'uptime': uptime,
+            'requests': self.requests,
+            'records': self.records,
+            'errors': self.errors,
+            'batches': self.batches,
+            'meanBatch': self.batchRecords / self.batches if self.batches else 0,
+            'throughput': self.records / uptime if uptime > 0 else 0,  # 每秒记录数
+        }
+        if self.latencies:
+            latency = np.array(self.latencies) * 1000
+            result['latencyMs'] = {'p50': float(np.percentile(latency, 50)),
+                                   'p95': float(np.percentile(latency, 95)),
+                                   'p99': float(np.percentile(latency, 99)),
+                                   'max': float(latency.max())}
+        return result
+
+
+class Batcher:
+    '''
+    单个模型的请求合并
+    ===============
+    Methods
+    -------
+    - `submit(X, scores)` 提交一个请求的记录，返回该请求的预测结果
+    - `run()` 合并队列中的请求并批量预测，作为事件循环中的任务运行
+    '''
+
+    def __init__(self, model, maxBatch=256, maxDelay=0.002):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `model` 已训练的分类器
+        - `maxBatch` 每批的最大记录数，单个请求超过时单独成批
+        - `maxDelay` 等待后续请求的最长时间（秒）
+        '''
+
+        self.model = model
+        self.maxBatch = maxBatch
+        self.maxDelay = maxDelay
+        self.metrics = Metrics()
+        self.__queue = asyncio.Queue()
+        self.__executor = ThreadPoolExecutor(1)  # 预测在工作线程中进行
+
+    async def submit(self, X, scores=False):
+        '''
+        提交请求
+        ======
+        Arguments
+        ---------
+        - `X` 记录矩阵
+        - `scores` 是否返回决策函数值
+
+        Returns
+        -------
+        - 包含 `predictions`（及 `scores`）的字典
+        '''
+        future = asyncio.get_running_loop().create_future()
+        await self.__queue.put((X, scores, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.__queue.get()]
+            records = pending[0][0].shape[0]
+            deadline = loop.time() + self.maxDelay
+            while records < self.maxBatch:  # 在等待时间内收集后续请求
+                if self.__queue.empty():
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self.__queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self.__queue.get_nowait()
+                pending.append(item)
+                records += item[0].shape[0]
+            results = await loop.run_in_executor(self.__executor, self.score, pending)
+            for (_, _, future), result in zip(pending, results):
+                if future.done():  # 请求已取消
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def score(self, pending):
+        '''
+        批量预测
+        ======
+        Arguments
+        ---------
+        - `pending` `(X, scores, future)` 列表
+
+        Returns
+        -------
+        - 各请求的结果字典或异常
+        '''
+        try:
+            X = np.vstack([x for x, _, _ in pending])
+            if any(wanted for _, wanted, _ in pending):  # 类别由得分得到，模型只计算一遍
+                scores = self.model.decision_function(X)
+                predictions = self.model.predictFromDecision(scores)
+            else:
+                scores = None
+                predictions = self.model.predict(X)
+        except Exception as error:
+            if len(pending) == 1:
+                return [error]
+            return [self.score([item])[0] for item in pending]  # 逐个请求重新预测
+        self.metrics.batch(X.shape[0])
+        results = []
+        begin = 0
+        for x, wanted, _ in pending:
+            end = begin + x.shape[0]
+            result = {'predictions': np.asarray(predictions[begin:end]).tolist()}
+            if wanted:
+                result['scores'] = np.asarray(scores[begin:end]).tolist()
+            results.append(result)
+            begin = end
+        return results
+
+
+def parseInstances(request, model):
+    '''
+    解析请求中的记录
+    =============
+    Arguments
+    ---------
+    - `request` 请求的 JSON 对象，含 `instance`（单条特征向量）、`instances`（特征向量列表）
+      或 `records`（原始记录列表）
+    - `model` 分类器，使用其浮点类型与预处理流水线
+
+    Returns
+    -------
+    - 特征矩阵
+    '''
+    dtype = model.dtype
+    if 'records' in request:
+        if model.pipeline is None:
+            raise ValueError('model was saved without a preprocessing pipeline, send instances instead')
+        records = request['records']
+        if not isinstance(records, list) or not all(isinstance(record, list) for record in records):
+            raise ValueError('records must be a list of records')
+        X = model.pipeline.transform(
+            np.array([[str(value) for value in record] for record in records], dtype=str))
+    elif 'instance' in request:
+        X = np.asarray([request['instance']], dtype=dtype)
+    elif 'instances' in request:
+        X = np.asarray(request['instances'], dtype=dtype)
+    else:
+        raise ValueError("request requires 'instance', 'instances' or 'records'")
+    if X.ndim != 2 or X.shape[0] == 0:
+        raise ValueError('instances must be a non-empty list of equal-length records')
+    return X
+
+
+class ScoringServer:
+    '''
+    模型评分服务
+    ==========
+    Methods
+    -------
+    - `serve(host, port, unix)` 监听并处理请求，直到被中断
+    - `handle(reader, writer)` 处理一个连接上的 HTTP/1.1 请求（支持 keep-alive）
+    - `route(method, path, body)` 按路径分派请求
+    '''
+
+    def __init__(self, models, maxBatch=256, maxDelay=0.002):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `models` 名称 -> 已训练的分类器
+        - `maxBatch`、`maxDelay` 见 `Batcher`
+        '''
+
+        self.models = models
+        self.maxBatch = maxBatch
+        self.maxDelay = maxDelay
+        self.batchers = {}  # 名称 -> Batcher，在事件循环中创建
+
+    async def serve(self, host='127.0.0.1', port=8000, unix=None):
+        self.batchers = {name: Batcher(model, self.maxBatch, self.maxDelay)
+                         for name, model in self.models.items()}
+        workers = [asyncio.create_task(batcher.run())
+                   for batcher in self.batchers.values()]
+        if unix is not None:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+            print('serving {} on {}'.format(', '.join(self.models), unix))
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            print('serving {} on http://{}:{}'.format(', '.join(self.models), host, port))
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                requestLine = await reader.readline()
+                if not requestLine.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    key, _, value = line.decode('latin1').partition(':')
+                    headers[key.strip().lower()] = value.strip()
+                parts = requestLine.decode('latin1').split()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                except ValueError:
+                    length = -1
+                if len(parts) != 3:
+                    status, payload = 400, {'error': 'malformed request line'}
+                elif length < 0:  # 无法确定请求体的边界，回复后关闭连接
+                    status, payload = 400, {'error': 'invalid Content-Length'}
+                elif length > MAX_BODY:
+                    status, payload = 413, {'error': 'request body too large'}
+                else:
+                    body = await reader.readexactly(length) if length else b''
+                    status, payload = await self.route(parts[0], parts[1], body)
+                keepAlive = len(parts) == 3 and parts[2] == 'HTTP/1.1' and \
+                    headers.get('connection', '').lower() != 'close' and status != 413 and length >= 0
+                data = json.dumps(payload).encode()
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\nConnection: {}\r\n\r\n'.format(
+                    status, REASONS[status], len(data), 'keep-alive' if keepAlive else 'close').encode('latin1') + data)
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        '''
+        按路径分派请求
+        ===========
+        Returns
+        -------
+        - `(状态码, JSON 对象)`
+        '''
+        path = path.split('?', 1)[0]
+        if path == '/health':
+            return 200, {'status': 'ok'}
+        if path == '/models':
+            return 200, {name: {'algorithm': model.name, 'dtype': model.dtype.name, 'params': model.getParams()}
+                         for name, model in self.models.items()}
+        if path == '/stats':
+            return 200, {name: batcher.metrics.asDict() for name, batcher in self.batchers.items()}
+        if path != '/predict':
+            return 404, {'error': 'unknown path ' + path}
+        if method != 'POST':
+            return 405, {'error': 'use POST for /predict'}
+
+        start = time.perf_counter()
+        try:
+            request = json.loads(body or b'{}')
+            if not isinstance(request, dict):
+                raise ValueError('request must be a JSON object')
+        except ValueError as error:
+            return 400, {'error': str(error)}
+        name = request.get('model')
+        if name is None and len(self.batchers) == 1:
+            name = next(iter(self.batchers))
+        if name not in self.batchers:
+            return 404, {'error': 'unknown model {}, loaded: {}'.format(name, ', '.join(self.batchers))}
+        batcher = self.batchers[name]
+        try:
+            X = parseInstances(request, batcher.model)
+            result = await batcher.submit(X, bool(request.get('scores', False)))
+        except (ValueError, TypeError) as error:
+            batcher.metrics.error()
+            return 400, {'error': str(error)}
+        except Exception as error:
+            batcher.metrics.error()
+            return 500, {'error': '{}: {}'.format(type(error).__name__, error)}
+        batcher.metrics.request(X.shape[0], time.perf_counter() - start)
+        return 200, result
+
+
+def loadModels(specifications):
+    '''
+    加载已保存的模型
+    =============
+    Arguments
+    ---------
+    - `specifications` `文件` 或 `名称=文件` 列表
+
+    Returns
+    -------
+    - 名称 -> 已训练的分类器
+    '''
+    models = {}
+    for specification in specifications:
+        name, separator, file = specification.partition('=')
+        if not separator:
+            name, file = os.path.splitext(os.path.basename(specification))[0], specification
+        models[name] = estimator.load(file)
+        print('loaded {} model {} from {}'.format(models[name].name, name, file))
+    return models
+
+
+if __name__ == "__main__":
+    # 命令行参数分析
+    parser = argparse.ArgumentParser(
+        description='Scoring server for saved models', epilog='PB17000297 罗晏宸 AI Programming Assignment 2', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-m', '--model', metavar='[name=]file', dest='models', nargs='+', required=True,
+                        help='Saved models (.npz from main.py -o) to serve, named after the file unless given as name=file')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='Address to listen on')
+    parser.add_argument('-p', '--port', default=8000, type=int,
+                        help='HTTP port to listen on')
+    parser.add_argument('--unix', metavar='path', default=None,
+                        help='Listen on a Unix domain socket instead of a TCP port')
+    parser.add_argument('-b', '--max-batch', metavar='records', dest='maxBatch', default=256, type=int,
+                        help='Maximum records coalesced into one predict call')
+    parser.add_argument('-d', '--max-delay', metavar='ms', dest='maxDelay', default=2, type=float,
+                        help='Maximum time to wait for concurrent requests before predicting')
+    instrument.addArguments(parser)
+
+    args = parser.parse_args()
+
+    stats = instrument.fromArguments(args)  # 未指定统计参数时为 None
+    models = loadModels(args.models)
+    for model in models.values():
+        model.stats = stats
+
+    with instrument.profile(args.profile):
+        try:
+            asyncio.run(ScoringServer(models, args.maxBatch, args.maxDelay / 1000).serve(
+                args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+
+    instrument.export(stats, args)
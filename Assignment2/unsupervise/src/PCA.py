@@ -0,0 +1,444 @@
+'''
+PCA(Principal Components Analysis)
+===
+    使用主成分分析对数据矩阵进行降维
+Provides
+--------
+- 主成分分析类::
+
+    >>> pca = PrincipalComponentAnalysis(threshold=0.99, solver='eigh')
+
+- 在数据矩阵`data`上拟合主成分::
+
+    >>> pca.fit(data)
+
+- 将数据矩阵`data`投影到已拟合的主成分上::
+
+    >>> pca.transform(data)
+
+- 保存与加载拟合结果，新数据无需重新拟合即可降维::
+
+    >>> pca.save('pca.npz')
+    >>> pca = PrincipalComponentAnalysis.load('pca.npz')
+
+- 增量主成分分析类，逐块读入无法全部载入内存的数据::
+
+    >>> ipca = IncrementalPrincipalComponentAnalysis(threshold=0.99, standardize=True)
+    >>> ipca.fit(chunks)
+    >>> for lowerDimensionalChunk in ipca.transform_chunks(chunks): ...
+
+'''
+
+import numpy as np
+
+
+def selectComponents(eigenValues, total, threshold):
+    '''
+    按累计贡献率选取主成分数目
+    =======================
+    Arguments
+    ---------
+    - `eigenValues` 由大到小排序的特征值
+    - `total` 全部特征值之和（总方差）
+    - `threshold` 特征值的累计贡献率
+
+    Formula
+    -------
+    Sum(first m-1 eigenvalues) / Sum(all eigenvalues) < threshold <= Sum(first m eigenvalues) / Sum(all eigenvalues)
+
+    Returns
+    -------
+    - `m` 主成分数目
+    '''
+    ratio = np.cumsum(eigenValues) / total  # 累计贡献率
+    m = np.searchsorted(ratio, threshold) + 1  # 首个累计贡献率不小于阈值的位置
+    return int(min(m, len(eigenValues)))
+
+
+def flipSigns(components):
+    '''
+    确定主成分方向
+    ============
+    Arguments
+    ---------
+    - `components` 主成分矩阵，每行为一个主成分
+
+    Returns
+    -------
+    - 每行绝对值最大的分量为正的主成分矩阵，使不同求解器的结果可以比较
+    '''
+    signs = np.sign(components[np.arange(components.shape[0]),
+                               np.argmax(np.abs(components), axis=1)])
+    signs[signs == 0] = 1
+    return components * signs[:, np.newaxis]
+
+
+class PrincipalComponentAnalysis:
+    '''
+    主成分分析
+    ========
+    Methods
+    -------
+    - `fit(data)` 拟合主成分
+    - `transform(data)` 投影到主成分
+    - `fit_transform(data)` 拟合并投影
+    - `save(file)` 保存拟合结果
+    - `load(file)` 加载拟合结果
+    '''
+
+    def __init__(self, threshold=0.99, nComponents=None, solver='eigh', oversampling=10, powerIterations=4, seed=None, dtype='float64'):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `threshold` 特征值的累计贡献率
+        - `nComponents` 主成分数目上限，`None` 表示仅由 `threshold` 决定
+        - `solver` 求解器
+            - `'eigh'` 对协方差矩阵使用对称特征值分解
+            - `'svd'` 对中心化数据矩阵使用奇异值分解
+            - `'randomized'` 随机截断奇异值分解，适用于属性数目很多的数据，必须指定 `nComponents`
+        - `oversampling` 随机截断奇异值分解的过采样数
+        - `powerIterations` 随机截断奇异值分解的幂迭代次数
+        - `seed` 随机数种子
+        - `dtype` 浮点类型，`'float64'` 或 `'float32'`
+        '''
+
+        if solver not in ('eigh', 'svd', 'randomized'):
+            raise ValueError('unknown solver ' + str(solver))
+        if solver == 'randomized' and nComponents is None:  # 否则草图为满秩，不做截断
+            raise ValueError('the randomized solver requires nComponents')
+        self.threshold = threshold
+        self.nComponents = nComponents
+        self.solver = solver
+        self.oversampling = oversampling
+        self.powerIterations = powerIterations
+        self.seed = seed
+        self.dtype = np.dtype(dtype)
+
+    def __eigh(self, centered):
+        eigenValues, eigenVectors = np.linalg.eigh(
+            np.cov(centered, rowvar=False))  # 协方差矩阵为实对称矩阵，特征值为实数且升序排列
+        return eigenValues[::-1], eigenVectors[:, ::-1].T  # 由大到小排序，每行为一个特征向量
+
+    def __svd(self, centered):
+        _, singularValues, Vt = np.linalg.svd(centered, full_matrices=False)
+        return np.square(singularValues) / (centered.shape[0] - 1), Vt
+
+    def __randomized(self, centered):
+        rank = min(centered.shape)
+        k = min(self.nComponents, rank)
+        sketch = min(k + self.oversampling, rank)  # 草图维数
+
+        rng = np.random.default_rng(self.seed)
+        Y = centered @ rng.standard_normal(
+            (centered.shape[1], sketch), dtype=centered.dtype)
+        for _ in range(self.powerIterations):  # 幂迭代，使奇异值谱衰减更快
+            Q, _ = np.linalg.qr(Y)
+            Y = centered @ (centered.T @ Q)
+        Q, _ = np.linalg.qr(Y)  # 值域的正交基
+
+        _, singularValues, Vt = np.linalg.svd(
+            Q.T @ centered, full_matrices=False)
+        return np.square(singularValues[:k]) / (centered.shape[0] - 1), Vt[:k]
+
+    def fit(self, data):
+        '''
+        拟合主成分
+        ========
+        Arguments
+        ---------
+        - `data` （Z-Score 标准化后的）数据矩阵
+
+        Returns
+        -------
+        - `self`
+        '''
+        data = np.asarray(data, dtype=self.dtype)
+        self.mean = np.mean(data, axis=0)
+        centered = data - self.mean
+        total = np.sum(np.var(centered, axis=0, ddof=1))  # 总方差，即协方差矩阵的迹
+
+        if self.solver == 'eigh':
+            eigenValues, eigenVectors = self.__eigh(centered)
+        elif self.solver == 'svd':
+            eigenValues, eigenVectors = self.__svd(centered)
+        else:
+            eigenValues, eigenVectors = self.__randomized(centered)
+
+        m = len(eigenValues) if self.threshold is None else selectComponents(
+            eigenValues, total, self.threshold)
+        if self.nComponents is not None:
+            m = min(m, self.nComponents)
+
+        # 选取前 m 个特征值对应的特征向量，作为新的特征空间的一组基
+        self.components = flipSigns(eigenVectors[:m])
+        self.explainedVariance = eigenValues[:m]
+        self.explainedVarianceRatio = eigenValues[:m] / total
+        return self
+
+    def transform(self, data):
+        '''
+        投影到主成分
+        ==========
+        Arguments
+        ---------
+        - `data` 数据矩阵，须与拟合数据做相同的标准化
+
+        Returns
+        -------
+        - 降维之后的数据矩阵
+        '''
+        return (np.asarray(data, dtype=self.dtype) - self.mean) @ self.components.T
+
+    def fit_transform(self, data):
+        '''
+        拟合主成分并投影
+        =============
+        Arguments
+        ---------
+        - `data` （Z-Score 标准化后的）数据矩阵
+
+        Returns
+        -------
+        - 降维之后的数据矩阵
+        '''
+        return self.fit(data).transform(data)
+
+    def save(self, file):
+        '''
+        保存拟合结果
+        ==========
+        Arguments
+        ---------
+        - `file` `.npz` 文件路径
+
+        Returns
+        -------
+        '''
+        np.savez(file, mean=self.mean, components=self.components,
+                 explainedVariance=self.explainedVariance,
+                 explainedVarianceRatio=self.explainedVarianceRatio)
+
+    @staticmethod
+    def load(file):
+        '''
+        加载拟合结果
+        ==========
+        Arguments
+        ---------
+        - `file` `.npz` 文件路径
+
+        Returns
+        -------
+        - 已拟合的 `PrincipalComponentAnalysis`
+        '''
+        with np.load(file) as archive:
+            pca = PrincipalComponentAnalysis(
+                threshold=None, nComponents=None, solver='eigh', dtype=archive['components'].dtype)
+            pca.mean = archive['mean']
+            pca.components = archive['components']
+            pca.explainedVariance = archive['explainedVariance']
+            pca.explainedVarianceRatio = archive['explainedVarianceRatio']
+        return pca
+
+
+class IncrementalPrincipalComponentAnalysis:
+    '''
+    增量主成分分析
+    ===========
+    逐块累计均值、方差与协方差（Welford 算法的分块合并形式），
+    数据矩阵无需一次载入内存
+
+    Methods
+    -------
+    - `partial_fit(chunk)` 累计一块数据
+    - `fit(chunks)` 累计全部数据块
+    - `transform(chunk)` 投影一块数据到主成分
+    - `transform_chunks(chunks)` 逐块惰性投影
+    - `save(file)` 保存累计状态与拟合结果
+    - `load(file)` 加载累计状态与拟合结果
+    '''
+
+    def __init__(self, threshold=0.99, nComponents=None, standardize=True, dtype='float64'):
+        '''
+        类构造函数
+        ========
+        Arguments
+        ---------
+        - `threshold` 特征值的累计贡献率
+        - `nComponents` 主成分数目上限，`None` 表示仅由 `threshold` 决定
+        - `standardize` 是否以累计的均值与标准差做 Z-Score 标准化，与 `main.loadData` 一致
+        - `dtype` 投影使用的浮点类型，均值与协方差始终以 float64 累计，避免多块累加的舍入误差
+        '''
+
+        self.threshold = threshold
+        self.nComponents = nComponents
+        self.standardize = standardize
+        self.dtype = np.dtype(dtype)
+        self.count = 0  # 已累计的观测数
+        self.mean = None  # 累计均值
+        self.comoment = None  # 累计离差积和 Sum (x - mean)(x - mean)^T
+        self.components = None
+
+    def partial_fit(self, chunk):
+        '''
+        累计一块数据
+        ==========
+        Arguments
+        ---------
+        - `chunk` 原始（未标准化的）数据块
+
+        Formula
+        -------
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            mean = mean_a + delta * n_b / n
+            M = M_a + M_b + delta delta^T * n_a * n_b / n
+
+        Returns
+        -------
+        - `self`
+        '''
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.shape[0] == 0:
+            return self
+
+        n_b = chunk.shape[0]
+        mean_b = np.mean(chunk, axis=0)
+        centered = chunk - mean_b
+        comoment_b = centered.T @ centered
+
+        if self.count == 0:
+            self.mean, self.comoment = mean_b, comoment_b
+        else:
+            n = self.count + n_b
+            delta = mean_b - self.mean
+            self.mean = self.mean + delta * n_b / n
+            self.comoment = self.comoment + comoment_b + \
+                np.outer(delta, delta) * self.count * n_b / n
+        self.count += n_b
+        self.components = None  # 已拟合的主成分失效
+        return self
+
+    def fit(self, chunks):
+        '''
+        累计全部数据块并拟合主成分
+        =======================
+        Arguments
+        ---------
+        - `chunks` 可迭代的原始数据块
+
+        Returns
+        -------
+        - `self`
+        '''
+        for chunk in chunks:
+            self.partial_fit(chunk)
+        self.__solve()
+        return self
+
+    def __solve(self):
+        if self.count < 2:
+            raise ValueError('at least two observations are required')
+        covariance = self.comoment / (self.count - 1)
+        if self.standardize:
+            self.scale = np.sqrt(np.diag(self.comoment) / self.count)  # 总体标准差
+            self.scale[self.scale == 0] = 1
+            covariance = covariance / np.outer(self.scale, self.scale)
+        else:
+            self.scale = np.ones_like(self.mean)
+
+        eigenValues, eigenVectors = np.linalg.eigh(covariance)
+        eigenValues, eigenVectors = eigenValues[::-1], eigenVectors[:, ::-1].T
+        total = np.trace(covariance)
+
+        m = len(eigenValues) if self.threshold is None else selectComponents(
+            eigenValues, total, self.threshold)
+        if self.nComponents is not None:
+            m = min(m, self.nComponents)
+
+        self.components = flipSigns(eigenVectors[:m]).astype(self.dtype)
+        self.explainedVariance = eigenValues[:m]
+        self.explainedVarianceRatio = eigenValues[:m] / total
+
+    def transform(self, chunk):
+        '''
+        投影一块数据到主成分
+        =================
+        Arguments
+        ---------
+        - `chunk` 原始（未标准化的）数据块
+
+        Returns
+        -------
+        - 降维之后的数据块
+        '''
+        if self.components is None:
+            self.__solve()
+        chunk = np.asarray(chunk, dtype=self.dtype)
+        return ((chunk - self.mean.astype(self.dtype)) / self.scale.astype(self.dtype)) @ self.components.T
+
+    def transform_chunks(self, chunks):
+        '''
+        逐块惰性投影
+        ==========
+        Arguments
+        ---------
+        - `chunks` 可迭代的原始数据块
+
+        Returns
+        -------
+        - 逐块产生降维之后数据的生成器
+        '''
+        for chunk in chunks:
+            yield self.transform(chunk)
+
+    def save(self, file):
+        '''
+        保存累计状态与拟合结果
+        ==================
+        Arguments
+        ---------
+        - `file` `.npz` 文件路径
+
+        Returns
+        -------
+        '''
+        if self.components is None:
+            self.__solve()
+        np.savez(file, count=self.count, mean=self.mean, comoment=self.comoment,
+                 threshold=np.nan if self.threshold is None else self.threshold,
+                 nComponents=-1 if self.nComponents is None else self.nComponents,
+                 standardize=self.standardize, scale=self.scale, components=self.components,
+                 explainedVariance=self.explainedVariance,
+                 explainedVarianceRatio=self.explainedVarianceRatio)
+
+    @staticmethod
+    def load(file):
+        '''
+        加载累计状态与拟合结果，可继续累计新的数据块
+        =====================================
+        Arguments
+        ---------
+        - `file` `.npz` 文件路径
+
+        Returns
+        -------
+        - 已拟合的 `IncrementalPrincipalComponentAnalysis`
+        '''
+        with np.load(file) as archive:
+            threshold = float(archive['threshold'])
+            nComponents = int(archive['nComponents'])
+            ipca = IncrementalPrincipalComponentAnalysis(
+                threshold=None if np.isnan(threshold) else threshold,
+                nComponents=None if nComponents < 0 else nComponents,
+                standardize=bool(archive['standardize']), dtype=archive['components'].dtype)
+            ipca.count = int(archive['count'])
+            ipca.mean = archive['mean']
+            ipca.comoment = archive['comoment']
+            ipca.scale = archive['scale']
+            ipca.components = archive['components']
+            ipca.explainedVariance = archive['explainedVariance']
+            ipca.explainedVarianceRatio = archive['explainedVarianceRatio']
+        return ipca
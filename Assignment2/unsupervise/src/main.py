@@ -1,15 +1,29 @@
 import numpy as np
-import matplotlib.pyplot as plt
+import argparse
 import csv
+import os
+import sys
+import time
 
+from PCA import PrincipalComponentAnalysis, IncrementalPrincipalComponentAnalysis
 
-def loadData(file):
+sys.path.append(os.path.join(os.path.dirname(
+    os.path.abspath(__file__)), '..', '..', 'common'))
+import instrument  # 分阶段计时与计数
+import store  # 内存映射的数据矩阵
+
+BLOCK_ELEMENTS = 1 << 22  # k-means 每块距离矩阵的元素数上限
+SILHOUETTE_SAMPLE = 1000  # 内存映射的数据上计算轮廓系数的采样观测数
+
+
+def loadData(file, dtype=np.float64):
     '''
     加载数据集
     ========
     Arguments
     ---------
     - `file` 数据集文件
+    - `dtype` 数据的浮点类型
 
     Returns
     -------
@@ -27,33 +41,73 @@ def loadData(file):
             datum = line.strip().split(',')
             Attributes.append([float(x) for x in datum[1:]])
             Identifiers.append(int(datum[0]))
-        Data = np.array(Attributes)
+        Data = np.array(Attributes, dtype=dtype)
         average = np.mean(Data, axis=0)  # 属性平均值
         standardDeviation = np.std(Data, axis=0)  # 属性方差
         Data = (Data - average) / standardDeviation  # Z-Score 标准化
     return Data, Identifiers
 
 
-def saveData(data, file):
+def loadChunks(file, chunkSize, dtype=np.float64):
+    '''
+    逐块加载数据集
+    ===========
+    Arguments
+    ---------
+    - `file` 数据集文件
+    - `chunkSize` 每块的观测数
+    - `dtype` 数据的浮点类型
+
+    Returns
+    -------
+    - 逐块产生 `(Data, Identifiers)` 的生成器，`Data` 未经标准化
+    '''
+
+    print('start reading ' + file + ' in chunks')
+    Attributes = []
+    Identifiers = []
+    with open(file, 'r') as fileStream:
+        for line in fileStream:  # 逐行读取，不整体载入文件
+            datum = line.strip().split(',')
+            if len(datum) < 2:
+                continue
+            Attributes.append([float(x) for x in datum[1:]])
+            Identifiers.append(int(datum[0]))
+            if len(Attributes) == chunkSize:
+                yield np.array(Attributes, dtype=dtype), Identifiers
+                Attributes = []
+                Identifiers = []
+    if Attributes:
+        yield np.array(Attributes, dtype=dtype), Identifiers
+
+
+def saveData(data, cluster, file):
     '''
     保存聚类后的数据
     ========
     Arguments
     ---------
-    - `data` 聚类后数据
+    - `data` （降维后的）数据矩阵，可以是内存映射的 `.npy` 文件
+    - `cluster` 各观测的类别
     - `file` 文件目录
 
     Returns
     -------
+
+    Notes
+    -----
+    - 按块写入，首列以正整数表示类别，数据不整体载入内存
     '''
 
     print('start writeing ' + file)
     with open(file, "w") as fileStream:
         csvWriter = csv.writer(fileStream)
-        csvWriter.writerows(data)
+        for begin, block in store.blocks(data):
+            csvWriter.writerows(np.insert(
+                block, 0, values=cluster[begin:begin + block.shape[0]] + 1, axis=1))
 
 
-def PCA(data, threshold):
+def PCA(data, threshold, solver='eigh', dtype='float64', nComponents=None):
     '''
     利用主成分分析对数据矩阵进行降维
     ===
@@ -61,6 +115,9 @@ def PCA(data, threshold):
     ---------
     - `data` （Z-Score 标准化后的）数据矩阵
     - `threshold` 特征值的累计贡献率
+    - `solver` 求解器，见 `PCA.PrincipalComponentAnalysis`
+    - `dtype` 浮点类型
+    - `nComponents` 主成分数目上限，`'randomized'` 求解器必须指定
 
     Algorithm
     ---------
@@ -75,20 +132,7 @@ def PCA(data, threshold):
     - `lowerDimensionalData` 降维之后的矩阵数据矩阵
     '''
 
-    eigenValues, eigenVectors = np.linalg.eig(
-        np.cov(data, rowvar=0))  # 由协方差矩阵计算特征值与特征向量
-    eigenValuesIndices = np.argsort(eigenValues)[::-1]  # 由大到小排序后的下标
-    total = np.sum(eigenValues)  # 总和
-    total_m = 0
-    for m in range(len(eigenValues)):
-        if total_m / total >= threshold:
-            break
-        total_m += eigenValues[eigenValuesIndices[m]]
-    # 选取前 m 个特征值对应的特征向量，作为新的特征空间的一组基
-    eigenVectors_m = eigenVectors[eigenValuesIndices[0:m]]
-    lowerDimensionalData = np.dot(data, eigenVectors_m.T)  # 原始数据乘以基实现降维
-
-    return lowerDimensionalData
+    return PrincipalComponentAnalysis(threshold, nComponents, solver=solver, dtype=dtype).fit_transform(data)
 
 
 def distanceBetween(j, q):
@@ -111,50 +155,90 @@ def distanceBetween(j, q):
     return np.sqrt(np.sum(np.square(j - q)))  # Euclidean metric
 
 
-def KMeans(k, data):
+def clusterKMeans(k, data, stats=None):
     '''
-    使用 k-means 算法将数据进行聚类
+    使用 k-means 算法计算聚类
     ===
     Arguments
     ---------
     - `k` 聚类数
-    - `data` （降维后的）数据矩阵
+    - `data` （降维后的）数据矩阵，可以是内存映射的 `.npy` 文件（见 `common/store.py`）
+    - `stats` 统计对象（见 `common/instrument.py`），为 `None` 时不记录
 
     Algorithm
     ---------
-    - k-means
+    - k-means，每轮按行顺序读取数据块，分配到最近的质心并累计各簇的和与数据数，
+      轮末由累计量更新质心；数据只需顺序读取，内存中只有当前块与 k 个累计量
 
     Returns
     -------
-    - 聚类后的数据
-    - 聚类的轮廓系数
+    - `cluster` 各观测的类别
+    - `centroids` 簇质心
     '''
 
-    centroids = np.empty([k, data.shape[1]], dtype=float)  # 簇质心
+    start = time.perf_counter()
+    centroids = np.empty([k, data.shape[1]], dtype=data.dtype)  # 簇质心，与数据同类型
     for i in range(k):
         index = np.random.randint(data.shape[0])  # 随机下标
         centroids[i] = data[index]  # Forgy 方法：选取随机观测作为初始质心
 
     isClusteringChanged = True  # 聚类是否改变
     cluster = np.zeros(data.shape[0], dtype=int)   # 类别
+    blockRows = max(1, BLOCK_ELEMENTS // (k * max(1, data.shape[1])))
 
+    iterations = reassignments = 0  # 迭代次数与类别改变的观测数
     while isClusteringChanged:
         isClusteringChanged = False
-        for i in range(data.shape[0]):  # 更新质心
-            minDistance = float("inf")
-            minCentroid = 0
-            for j in range(k):
-                if (distance:=distanceBetween(data[i], centroids[j])) < minDistance: # 计算观测到质心距离
-                    minDistance = distance
-                    minCentroid = j
-            if cluster[i] != minCentroid:
-                cluster[i] = minCentroid
+        iterations += 1
+        sums = np.zeros([k, data.shape[1]], dtype=np.float64)  # 各簇数据之和
+        counts = np.zeros(k, dtype=np.int64)  # 各簇数据数
+        for begin, block in store.blocks(data, blockRows):
+            squared = np.sum(np.square(block[:, np.newaxis, :] - centroids[np.newaxis, :, :]),
+                             axis=2)  # 观测到质心距离的平方
+            squared[:, np.isnan(centroids[:, 0])] = np.inf  # 空簇不再分配
+            nearest = np.argmin(squared, axis=1)
+            changed = np.count_nonzero(
+                cluster[begin:begin + block.shape[0]] != nearest)
+            if changed:
+                cluster[begin:begin + block.shape[0]] = nearest
                 isClusteringChanged = True
+                reassignments += changed
+            np.add.at(sums, nearest, block)
+            counts += np.bincount(nearest, minlength=k)
 
-        for j in range(k):
-            centroids[j] = np.mean(
-                data[np.nonzero(cluster == j)], axis=0)  # 根据类别更新质心
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroids[:] = sums / counts[:, np.newaxis]  # 根据类别更新质心，空簇为 NaN
+
+    if stats is not None:
+        stats.add('KMeans.cluster', start)
+        stats.count('KMeans.iterations', iterations)
+        stats.count('KMeans.reassignments', reassignments)
+    return cluster, centroids
+
+
+def silhouetteCoefficient(data, cluster, centroids, stats=None, sample=None):
+    '''
+    计算聚类的轮廓系数
+    ===============
+    Arguments
+    ---------
+    - `data` （降维后的）数据矩阵
+    - `cluster` 各观测的类别
+    - `centroids` 簇质心
+    - `stats` 统计对象，为 `None` 时不记录
+    - `sample` 采样的观测数，`None` 表示使用全部观测；采样时只在样本内计算距离，结果为估计值
+
+    Returns
+    -------
+    - 聚类的轮廓系数
+    '''
 
+    start = time.perf_counter()
+    if sample is not None and sample < data.shape[0]:
+        index = np.sort(np.random.default_rng(0).choice(
+            data.shape[0], sample, replace=False))  # 固定种子，不影响 k-means 的随机初始化
+        data, cluster = np.asarray(data[index]), cluster[index]
+    k = centroids.shape[0]
     a = [0] * data.shape[0]
     b = [0] * data.shape[0]
     Silhouette = [0] * data.shape[0]
@@ -172,10 +256,64 @@ def KMeans(k, data):
             data.shape[0]) if cluster[j] == minNeighborCentroid])  # i 到相邻簇中所有点距离的均值
         Silhouette[i] = (b[i] - a[i]) / max(a[i], b[i])
 
-    data_clustered = np.insert(
-        data, 0, values=cluster + 1, axis=1)  # 以首列的正整数表示类别
+    if stats is not None:
+        stats.add('KMeans.silhouette', start)
+    return np.mean(Silhouette)
+
 
-    return data_clustered, np.mean(Silhouette)
+def KMeans(k, data, stats=None):
+    '''
+    使用 k-means 算法将数据进行聚类
+    ===
+    Arguments
+    ---------
+    - `k` 聚类数
+    - `data` （降维后的）数据矩阵，可以是内存映射的 `.npy` 文件
+    - `stats` 统计对象，为 `None` 时不记录
+
+    Algorithm
+    ---------
+    - k-means
+
+    Returns
+    -------
+    - 各观测的类别
+    - 聚类的轮廓系数，数据为内存映射时在 `SILHOUETTE_SAMPLE` 个采样观测上估计
+    '''
+
+    cluster, centroids = clusterKMeans(k, data, stats)
+    sample = SILHOUETTE_SAMPLE if isinstance(data, np.memmap) else None
+
+    return cluster, silhouetteCoefficient(data, cluster, centroids, stats, sample)
+
+
+def contingencyTable(trueLabel, clusterLabel):
+    '''
+    计算标签列联表
+    ===========
+    Arguments
+    ---------
+    - `trueLabel` 实际标签
+    - `clusterLabel` 聚类标签
+
+    Returns
+    -------
+    - `table` 列联表，`table[i, j]` 为实际类别 i 且聚类类别 j 的数据点数
+    '''
+    _, trueIndex = np.unique(np.asarray(trueLabel), return_inverse=True)
+    _, clusterIndex = np.unique(np.asarray(clusterLabel), return_inverse=True)
+    trueIndex, clusterIndex = trueIndex.ravel(), clusterIndex.ravel()
+    shape = (trueIndex.max() + 1, clusterIndex.max() + 1)
+    return np.bincount(trueIndex * shape[1] + clusterIndex,
+                       minlength=shape[0] * shape[1]).reshape(shape)  # O(n) 计数
+
+
+def pairs(n):
+    '''
+    计算数据点对数 C(n, 2)
+    '''
+    n = np.asarray(n, dtype=np.int64)
+    return n * (n - 1) // 2
 
 
 def clusterTest(trueLabel, clusterLabel):
@@ -189,50 +327,164 @@ def clusterTest(trueLabel, clusterLabel):
 
     Formula
     -------
-        (a + d) / (a + b + c + d)
+        RI = (a + d) / (a + b + c + d)
         - a 为在 trueLabel 中属同一类且在 clusterLabel 中也属同一类的数据点对数
         - b 为在 trueLabel 中属同一类但在 clusterLabel 中不属同一类的数据点对数
         - c 为在 trueLabel 中不属同一类但在 clusterLabel 中属同一类的数据点对数
         - d 为在 trueLabel 中不属同一类且在 clusterLabel 中也不属同一类的数据点对数
+        由列联表 n_ij 及其行和 a_i、列和 b_j 得
+        - a = Sum C(n_ij, 2)
+        - a + b = Sum C(a_i, 2)
+        - a + c = Sum C(b_j, 2)
+        ARI = (a - E[a]) / ((a + b + a + c) / 2 - E[a]), E[a] = (a + b)(a + c) / C(n, 2)
+        NMI = I(trueLabel; clusterLabel) / ((H(trueLabel) + H(clusterLabel)) / 2)
 
     Returns
     -------
     - 兰德系数(Rand index, RI)
+    - 调整兰德系数(Adjusted Rand index, ARI)
+    - 归一化互信息(Normalized mutual information, NMI)
     '''
 
-    a = b = c = d = 0
-    for i in range(len(trueLabel)):
-        for j in range(i + 1, len(trueLabel)):  # 遍历数据点对
-            if trueLabel[i] == trueLabel[j]:  # 在 trueLabel 中属同一类
-                if clusterLabel[i] == clusterLabel[j]:  # 在 clusterLabel 中也属同一类
-                    a += 1
-                else:  # 在 clusterLabel 中不属同一类
-                    b += 1
-            else:  # 在 trueLabel 中不属同一类
-                if clusterLabel[i] == clusterLabel[j]:  # 在 clusterLabel 中属同一类
-                    c += 1
-                else:  # 在 clusterLabel 中也不属同一类
-                    d += 1
+    table = contingencyTable(trueLabel, clusterLabel)
+    n = int(table.sum())
+    rowSum = table.sum(axis=1)
+    columnSum = table.sum(axis=0)
+
+    total = int(pairs(n))
+    a = int(pairs(table).sum())
+    sameTrue = int(pairs(rowSum).sum())  # a + b
+    sameCluster = int(pairs(columnSum).sum())  # a + c
+    b = sameTrue - a
+    c = sameCluster - a
+    d = total - a - b - c
     print('a = {:5}  b = {:5}'.format(a, b))
     print('c = {:5}  d = {:5}'.format(c, d))
 
-    return (a + d) / (a + b + c + d)  # 兰德系数
+    randIndex = (a + d) / total if total > 0 else 1.0  # 兰德系数
 
+    expected = sameTrue * sameCluster / total if total > 0 else 0.0
+    maximum = (sameTrue + sameCluster) / 2
+    adjustedRandIndex = (a - expected) / \
+        (maximum - expected) if maximum != expected else 1.0  # 调整兰德系数
 
-if __name__ == "__main__":
-    Data, Identifiers = loadData('../data/wine/wine.data')  # 读取数据与实际类别
+    nonzero = table > 0
+    joint = table[nonzero] / n
+    outer = np.outer(rowSum, columnSum)[nonzero] / (n * n)
+    mutualInformation = np.sum(joint * np.log(joint / outer))
+    trueEntropy = -np.sum((rowSum / n) * np.log(rowSum / n))
+    clusterEntropy = -np.sum((columnSum / n) * np.log(columnSum / n))
+    normalizer = (trueEntropy + clusterEntropy) / 2
+    normalizedMutualInformation = mutualInformation / \
+        normalizer if normalizer > 0 else 1.0  # 归一化互信息
+
+    return randIndex, adjustedRandIndex, float(normalizedMutualInformation)
 
-    silhouetteCoefficient = []
-    for k in range(1, 13):
-        data_clustered, silhouette = KMeans(k, PCA(Data, 0.99))
-        silhouetteCoefficient.append(silhouette)
 
-    plt.bar(list(range(1, 13)), silhouetteCoefficient, align='center')
+def plotSilhouette(silhouetteCoefficients, file):
+    '''
+    绘制类别数与轮廓系数关系图
+    =====================
+    Arguments
+    ---------
+    - `silhouetteCoefficients` k = 1, 2, ... 时的轮廓系数
+    - `file` 图片路径
+    '''
+    import matplotlib
+    matplotlib.use('Agg')  # 仅保存图片，无需图形界面
+    import matplotlib.pyplot as plt
+
+    plt.bar(list(range(1, len(silhouetteCoefficients) + 1)),
+            silhouetteCoefficients, align='center')
     plt.title('Silhouette Graph')
     plt.xlabel('k-cluster')
     plt.ylabel('Silhouette Coefficient')
-    plt.savefig('../output/SilhouetteCoefficient.png')  # 显示类别数与轮廓系数关系
+    plt.savefig(file)
 
-    data_clustered, silhouette = KMeans(3, PCA(Data, 0.99))
-    saveData(data_clustered, '../output/wine_clustered.csv')  # 聚类后结果保存至 csv 文件
-    print('Rand index = ', clusterTest(Identifiers, data_clustered[:, 0]))
+
+if __name__ == "__main__":
+    # 命令行参数分析
+    parser = argparse.ArgumentParser(
+        description='Simple clustering test', epilog='PB17000297 罗晏宸 AI Programming Assignment 2', formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-t', '--threshold', metavar='ratio', default=0.99, type=float,
+                        help='Cumulative explained variance ratio of chosen principal components')
+    parser.add_argument('-s', '--solver', default='eigh', choices=['eigh', 'svd', 'randomized'],
+                        help='Solver of principal components analysis (randomized requires --components)')
+    parser.add_argument('-n', '--components', metavar='m', dest='nComponents', default=None, type=int,
+                        help='Maximum number of principal components (default: chosen by --threshold only)')
+    parser.add_argument('-c', '--chunk-size', metavar='rows', dest='chunkSize', default=0, type=int,
+                        help='Read the data set in chunks of this many rows and fit principal components incrementally (0 to load it at once)')
+    parser.add_argument('--save-pca', metavar='file', dest='savePCA', default=None,
+                        help='Save fitted principal components to a .npz file')
+    parser.add_argument('--load-pca', metavar='file', dest='loadPCA', default=None,
+                        help='Project data onto principal components loaded from a .npz file instead of fitting')
+    parser.add_argument('--dtype', default='float64', choices=['float64', 'float32'],
+                        help='Floating point type of the data, principal components and centroids')
+    parser.add_argument('--store', metavar='file', default=None,
+                        help='Write the reduced data to a .npy file and cluster it memory-mapped, block by block (with --chunk-size the data is never held in memory at once)')
+    parser.add_argument('--no-plot', dest='plot', action='store_false',
+                        help='Do not draw the silhouette graph (matplotlib is not imported)')
+    instrument.addArguments(parser)
+
+    args = parser.parse_args()
+    if args.solver == 'randomized' and args.nComponents is None and args.loadPCA is None:
+        parser.error('--solver randomized requires --components')
+
+    stats = instrument.fromArguments(args)  # 未指定统计参数时为 None
+    with instrument.profile(args.profile):
+        file = '../data/wine/wine.data'
+        start = time.perf_counter()
+
+        if args.chunkSize > 0:  # 增量主成分分析，数据集无需整体载入内存
+            if args.loadPCA is not None:
+                pca = IncrementalPrincipalComponentAnalysis.load(args.loadPCA)
+            else:
+                pca = IncrementalPrincipalComponentAnalysis(args.threshold, args.nComponents, dtype=args.dtype).fit(
+                    chunk for chunk, _ in loadChunks(file, args.chunkSize))  # 第一遍：累计均值与协方差
+            Identifiers = []
+
+            def transformChunks():  # 第二遍：逐块降维
+                for chunk, identifiers in loadChunks(file, args.chunkSize, args.dtype):
+                    Identifiers.extend(identifiers)
+                    yield pca.transform(chunk)
+
+            if args.store is not None:  # 逐块写入文件，降维后的数据不整体载入内存
+                store.write(args.store, transformChunks())
+                lowerDimensionalData = store.load(args.store)
+            else:
+                lowerDimensionalData = np.vstack(list(transformChunks()))
+        else:
+            Data, Identifiers = loadData(file, args.dtype)  # 读取数据与实际类别
+            if args.loadPCA is not None:
+                pca = PrincipalComponentAnalysis.load(args.loadPCA)  # 无需重新拟合
+            else:
+                pca = PrincipalComponentAnalysis(
+                    args.threshold, args.nComponents, solver=args.solver, dtype=args.dtype).fit(Data)
+            lowerDimensionalData = pca.transform(Data)  # 只降维一次，各 k 值共用
+            if args.store is not None:
+                store.write(args.store, [lowerDimensionalData])
+                lowerDimensionalData = store.load(args.store)
+        if args.savePCA is not None:
+            pca.save(args.savePCA)
+        if stats is not None:
+            stats.add('loadData+PCA', start)
+
+        silhouetteCoefficients = []
+        for k in range(1, 13):
+            cluster, silhouette = KMeans(k, lowerDimensionalData, stats)
+            silhouetteCoefficients.append(silhouette)
+
+        if args.plot:
+            plotSilhouette(silhouetteCoefficients,
+                           '../output/SilhouetteCoefficient.png')  # 显示类别数与轮廓系数关系
+
+        cluster, silhouette = KMeans(3, lowerDimensionalData, stats)
+        saveData(lowerDimensionalData, cluster,
+                 '../output/wine_clustered.csv')  # 聚类后结果保存至 csv 文件
+        randIndex, adjustedRandIndex, normalizedMutualInformation = clusterTest(
+            Identifiers, cluster + 1)
+        print('Rand index = ', randIndex)
+        print('Adjusted Rand index = ', adjustedRandIndex)
+        print('Normalized mutual information = ', normalizedMutualInformation)
+
+    instrument.export(stats, args)